@@ -6,8 +6,12 @@ DB_NAME = "recipes.db"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, DB_NAME)
 
+# Tables whose writes bump a counter in data_versions, so long-running processes (the API's
+# in-memory search and pantry indexes) notice changes made by the scripts and reload
+VERSIONED_TABLES = ("recipes", "recipe_ingredients", "recipe_embeddings")
+
 def get_db_connection():
-    print(f"DEBUG: Connecting to DB at {DB_PATH}")
+    """Open a standalone connection (scripts, init_db). Request handlers use database.pool."""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
@@ -28,6 +32,14 @@ def init_db():
         );
     ''')
     
+    # Natural key and content hash per recipe, for incremental re-ingestion (services/recipe_sync.py)
+    recipe_columns = {row[1] for row in cursor.execute("PRAGMA table_info(recipes)")}
+    if "source_key" not in recipe_columns:
+        cursor.execute("ALTER TABLE recipes ADD COLUMN source_key TEXT")
+    if "content_hash" not in recipe_columns:
+        cursor.execute("ALTER TABLE recipes ADD COLUMN content_hash TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_source_key ON recipes (source_key)")
+
     # Favorites table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS favorites (
@@ -38,9 +50,123 @@ def init_db():
         );
     ''')
     
+    # Full-text index over recipes (external content, kept in sync by triggers)
+    fts_exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'"
+    ).fetchone()
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+            title,
+            ingredients,
+            instructions,
+            content='recipes',
+            content_rowid='id',
+            tokenize='porter unicode61'
+        );
+    ''')
+    cursor.executescript('''
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts (rowid, title, ingredients, instructions)
+            VALUES (new.id, new.title, new.ingredients, new.instructions);
+        END;
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+            INSERT INTO recipes_fts (recipes_fts, rowid, title, ingredients, instructions)
+            VALUES ('delete', old.id, old.title, old.ingredients, old.instructions);
+        END;
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE ON recipes BEGIN
+            INSERT INTO recipes_fts (recipes_fts, rowid, title, ingredients, instructions)
+            VALUES ('delete', old.id, old.title, old.ingredients, old.instructions);
+            INSERT INTO recipes_fts (rowid, title, ingredients, instructions)
+            VALUES (new.id, new.title, new.ingredients, new.instructions);
+        END;
+    ''')
+    if not fts_exists:
+        # Index recipes that were loaded before the FTS table existed
+        cursor.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('rebuild')")
+
+    # Ingredient inverted index, see services/ingredient_index.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_ingredients (
+            recipe_id INTEGER NOT NULL,
+            ingredient_id INTEGER NOT NULL,
+            PRIMARY KEY (recipe_id, ingredient_id),
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id),
+            FOREIGN KEY (ingredient_id) REFERENCES ingredients (id)
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient
+        ON recipe_ingredients (ingredient_id, recipe_id);
+    ''')
+
+    # Resolved image file per recipe, filled at ingestion (see services/image_index.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_images (
+            recipe_id INTEGER PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+        );
+    ''')
+
+    # Precomputed chunk embeddings (float32 BLOBs), see services/embedding_index.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_embeddings (
+            recipe_id INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            dim INTEGER NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (recipe_id, chunk_index),
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+        );
+    ''')
+
+    # Small key/value settings describing the loaded data (e.g. which natural key the recipes use)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        );
+    ''')
+
+    # Change counters for VERSIONED_TABLES, bumped by triggers on every row written
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+    ''')
+    for table in VERSIONED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO data_versions (name) VALUES (?)", (table,))
+        for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                END;
+            ''')
+
     conn.commit()
     conn.close()
 
+def get_data_version(conn, *tables):
+    """Current change counters of the given tables, for a cheap "has anything changed?" check."""
+    placeholders = ", ".join("?" for _ in tables)
+    versions = dict(conn.execute(
+        f"SELECT name, version FROM data_versions WHERE name IN ({placeholders})", tables
+    ).fetchall())
+    return tuple(versions.get(table) for table in tables)
+
+def bump_data_versions(conn):
+    """Mark every versioned table as changed (after writes made with the triggers dropped). Caller commits."""
+    conn.execute("UPDATE data_versions SET version = version + 1")
+
 if __name__ == "__main__":
     init_db()
     print(f"Database initialized at {DB_PATH}")
@@ -0,0 +1,188 @@
+"""
+Blocking recipe and favorite queries used by the API.
+Each function takes the connection pool and fetches the calling thread's connection, so it
+can be run from any worker thread (see services.executor.run_blocking).
+"""
+import re
+from typing import Any, Optional
+
+from database.pool import ConnectionPool
+
+
+def list_recipes(
+    db: ConnectionPool,
+    columns: tuple[str, ...],
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> list[dict[str, Any]]:
+    """Return recipes ordered by id, projected to `columns`, starting after `after_id`."""
+    query = f"SELECT {', '.join(columns)} FROM recipes"
+    params: list = []
+    if after_id is not None:
+        query += " WHERE id > ?"
+        params.append(after_id)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    rows = db.connection().execute(query, params).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_recipe(db: ConnectionPool, recipe_id: int) -> Optional[dict[str, Any]]:
+    """Return a full recipe row as a dict, or None if it doesn't exist."""
+    row = db.connection().execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def get_recipe_summaries(db: ConnectionPool, recipe_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """Return {id: {id, title, image_name}} for the given recipe IDs."""
+    if not recipe_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in recipe_ids)
+    rows = db.connection().execute(
+        f"SELECT id, title, image_name FROM recipes WHERE id IN ({placeholders})", recipe_ids
+    ).fetchall()
+    return {row["id"]: dict(row) for row in rows}
+
+
+def get_recipe_image_file(db: ConnectionPool, recipe_id: int) -> Optional[str]:
+    """Image file name stored for a recipe at ingestion, or None if it has no image."""
+    row = db.connection().execute(
+        "SELECT file_name FROM recipe_images WHERE recipe_id = ?", (recipe_id,)
+    ).fetchone()
+    return row[0] if row is not None else None
+
+
+# bm25 column weights for recipes_fts (title, ingredients, instructions)
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+
+def build_fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix. Returns "" if no words."""
+    terms = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_recipes_text(db: ConnectionPool, text: str, limit: int = 20, offset: int = 0) -> list[dict[str, Any]]:
+    """Keyword search ranked by BM25, with highlighted title and a matching snippet."""
+    match = build_fts_query(text)
+    if not match:
+        return []
+    rows = db.connection().execute(
+        f"""
+        SELECT r.id, r.title, r.image_name,
+               -bm25(recipes_fts, {", ".join(map(str, FTS_WEIGHTS))}) AS score,
+               highlight(recipes_fts, 0, '<mark>', '</mark>') AS title_highlight,
+               snippet(recipes_fts, -1, '<mark>', '</mark>', '…', 12) AS snippet
+        FROM recipes_fts
+        JOIN recipes r ON r.id = recipes_fts.rowid
+        WHERE recipes_fts MATCH ?
+        ORDER BY score DESC
+        LIMIT ? OFFSET ?
+        """,
+        (match, limit, offset),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_favorite_ids(
+    db: ConnectionPool, user_id: str, after_id: Optional[int] = None, limit: Optional[int] = None
+) -> list[int]:
+    """Return the recipe IDs favorited by a user, ordered by id, starting after `after_id`."""
+    query, params = _favorites_page("SELECT recipe_id FROM favorites f", user_id, after_id, limit)
+    rows = db.connection().execute(query, params).fetchall()
+    return [row["recipe_id"] for row in rows]
+
+
+def get_favorite_summaries(
+    db: ConnectionPool, user_id: str, after_id: Optional[int] = None, limit: Optional[int] = None
+) -> list[dict[str, Any]]:
+    """Return {id, title, image_name} of a user's favorite recipes in one join, ordered by id."""
+    query, params = _favorites_page(
+        "SELECT r.id, r.title, r.image_name FROM favorites f JOIN recipes r ON r.id = f.recipe_id",
+        user_id, after_id, limit,
+    )
+    rows = db.connection().execute(query, params).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _favorites_page(select: str, user_id: str, after_id: Optional[int], limit: Optional[int]) -> tuple[str, list]:
+    # Walks the (user_id, recipe_id) primary key, so pages need no sort
+    query = f"{select} WHERE f.user_id = ?"
+    params: list = [user_id]
+    if after_id is not None:
+        query += " AND f.recipe_id > ?"
+        params.append(after_id)
+    query += " ORDER BY f.recipe_id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+def update_favorites(db: ConnectionPool, user_id: str, add: list[int], remove: list[int]) -> tuple[int, int]:
+    """
+    Favorite `add` and unfavorite `remove` in one transaction. IDs of recipes that don't exist are
+    skipped. Returns (rows added, rows removed); already-set and already-unset IDs count as 0.
+    """
+    conn = db.connection()
+    added = removed = 0
+    with conn:
+        if add:
+            placeholders = ", ".join("?" for _ in add)
+            added = conn.execute(
+                f"INSERT OR IGNORE INTO favorites (user_id, recipe_id) "
+                f"SELECT ?, id FROM recipes WHERE id IN ({placeholders})",
+                [user_id, *add],
+            ).rowcount
+        if remove:
+            placeholders = ", ".join("?" for _ in remove)
+            removed = conn.execute(
+                f"DELETE FROM favorites WHERE user_id = ? AND recipe_id IN ({placeholders})",
+                [user_id, *remove],
+            ).rowcount
+    return added, removed
+
+
+def toggle_favorite(db: ConnectionPool, user_id: str, recipe_id: int) -> bool:
+    """Flip a user's favorite flag for a recipe. Returns the new state."""
+    conn = db.connection()
+    with conn:
+        # Write first: the DELETE takes the write lock, so concurrent toggles serialize instead of
+        # both reading "not favorited" and racing to insert
+        removed = conn.execute(
+            "DELETE FROM favorites WHERE user_id = ? AND recipe_id = ?", (user_id, recipe_id)
+        ).rowcount
+        if removed:
+            return False
+        conn.execute("INSERT INTO favorites (user_id, recipe_id) VALUES (?, ?)", (user_id, recipe_id))
+        return True
+
+
+def add_favorite(db: ConnectionPool, user_id: str, recipe_id: int) -> Optional[bool]:
+    """
+    Idempotently favorite a recipe in one statement. Returns True if the row was added, False if it
+    was already there, None if the recipe doesn't exist.
+    """
+    conn = db.connection()
+    with conn:
+        added = conn.execute(
+            "INSERT INTO favorites (user_id, recipe_id) SELECT ?, id FROM recipes WHERE id = ? "
+            "ON CONFLICT DO NOTHING",
+            (user_id, recipe_id),
+        ).rowcount
+    if added:
+        return True
+    # Nothing inserted: tell "already a favorite" apart from "no such recipe"
+    exists = conn.execute("SELECT 1 FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+    return False if exists else None
+
+
+def remove_favorite(db: ConnectionPool, user_id: str, recipe_id: int) -> bool:
+    """Idempotently unfavorite a recipe in one statement. Returns True if a row was removed."""
+    conn = db.connection()
+    with conn:
+        return conn.execute(
+            "DELETE FROM favorites WHERE user_id = ? AND recipe_id = ?", (user_id, recipe_id)
+        ).rowcount > 0
@@ -1,15 +1,21 @@
+import json
 import os
 import sqlite3
-from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Depends
+from typing import List, Optional, Union
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 import google.generativeai as genai
 from dotenv import load_dotenv
 
-from database.connection import get_db_connection, init_db
-from models.recipe import Recipe
+from database import queries
+from database.connection import init_db
+from database.pool import ConnectionPool, get_pool, pool
+from models.recipe import FavoritesBatchRequest, FavoritesBatchResult, PantryMatch, PantryRequest, Recipe, RecipeSearchResult, RecipeSummary, RecipeTextSearchResult, RECIPE_FIELDS
 from middleware.auth import verify_token
+from services.executor import get_executor, run_blocking, shutdown_executors
+from services.http_cache import cached_file_response
+from services.image_index import image_index
 from pydantic import BaseModel
 
 # Load environment variables from .env file
@@ -36,6 +42,18 @@ def on_startup():
     print("DEBUG: Executing init_db on startup...")
     init_db()
     print("DEBUG: init_db executed.")
+    from services.clients import warm_clients
+    print(f"DEBUG: API clients warmed: {warm_clients()}")
+    print(f"DEBUG: Image index built: {image_index.refresh()} files")
+    from middleware.auth import local_verifier
+    if local_verifier is not None:
+        # Fetch Google's public keys in the background so the first request doesn't wait for them
+        get_executor("auth").submit(local_verifier.keys.warm)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_executors()
+    pool.close_all()
 
 @app.get("/api/debug/fix-db")
 async def debug_fix_db():
@@ -45,6 +63,29 @@ async def debug_fix_db():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/debug/reindex-images")
+async def debug_reindex_images():
+    """Rescan Backend/images now (the index also refreshes itself when the directory changes)."""
+    files = await run_blocking("image", image_index.refresh)
+    return {"status": "success", "files": files}
+
+@app.get("/api/debug/cache-stats")
+async def debug_cache_stats():
+    from services.answer_cache import get_answer_cache
+    from services.semantic_cache import get_semantic_cache
+    from services import web_prefetch
+    from services.tavily_search import search_cache
+    from services.token_cache import token_cache
+    cache = get_answer_cache()
+    semantic = get_semantic_cache()
+    return {
+        "answer_cache": cache.stats() if cache else None,
+        "semantic_cache": semantic.stats() if semantic else None,
+        "tavily_speculation": web_prefetch.stats.as_dict(),
+        "tavily_cache": search_cache.stats(),
+        "auth_tokens": token_cache.stats(),
+    }
+
 
 # Enable CORS (Cross-Origin Resource Sharing) to allow frontend to connect
 # This is necessary because the frontend runs on a different port than the backend
@@ -56,6 +97,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all HTTP methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],  # Lets the frontend read the pagination cursor
 )
 
 @app.get("/")
@@ -85,7 +127,7 @@ async def get_random_quote():
     try:
         # Make a simple LLM call to generate a random quote
         model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content("Tell me a random inspirational quote")
+        response = await run_blocking("llm", model.generate_content, "Tell me a random inspirational quote")
         
         return {
             "success": True,
@@ -100,79 +142,185 @@ async def get_random_quote():
             detail=f"Error generating quote: {str(e)}"
         )
 
-@app.get("/api/recipes", response_model=List[Recipe])
+# Upper bound for a single page of /api/recipes
+MAX_PAGE_SIZE = 500
+
+
+def _parse_fields(fields: Optional[str]) -> tuple[str, ...]:
+    """Parse a comma-separated `fields=` projection. `id` is always included (it is the cursor)."""
+    if not fields:
+        return RECIPE_FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in RECIPE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns = ["id"] + [f for f in RECIPE_FIELDS if f in requested and f != "id"]
+    return tuple(columns)
+
+
+@app.get("/api/recipes", response_model=List[RecipeSummary], response_model_exclude_unset=True)
 async def get_recipes(
-    user = Depends(verify_token)
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,title,image_name"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all rows"),
+    after_id: Optional[int] = Query(None, description="Keyset cursor: return recipes with id greater than this"),
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
 ):
     """
-    Fetch all recipes from the database.
+    Fetch recipes ordered by id, with optional keyset pagination and field projection.
+    When a page is full, the cursor for the next page is returned in the X-Next-Cursor header.
     Requires Authentication.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    columns = _parse_fields(fields)
     try:
-        cursor.execute("SELECT * FROM recipes")
-        rows = cursor.fetchall()
-        recipes = [dict(row) for row in rows]
-        return recipes
+        recipes = await run_blocking("db", queries.list_recipes, db, columns, after_id, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if limit is not None and len(recipes) == limit:
+        response.headers["X-Next-Cursor"] = str(recipes[-1]["id"])
+    return recipes
+
+@app.get("/api/search", response_model=List[RecipeSearchResult])
+async def semantic_search(
+    q: str = Query(..., min_length=1, description="Natural-language query"),
+    k: int = Query(10, ge=1, le=50, description="Number of recipes to return"),
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    Semantic search across all recipes using the precomputed embedding index.
+    Requires Authentication.
+    """
+    from services.search_index import search_recipes
+    from services.vector_store import _get_embeddings
+
+    embeddings = _get_embeddings()
+    if embeddings is None:
+        raise HTTPException(status_code=503, detail="Semantic search is not configured")
+    try:
+        query_vector = await run_blocking("llm", embeddings.embed_query, q)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error embedding query: {str(e)}")
+    try:
+        return await run_blocking("db", search_recipes, db, query_vector, k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+# Declared before /api/recipes/{recipe_id} so "search" isn't parsed as an id
+@app.get("/api/recipes/search", response_model=List[RecipeTextSearchResult])
+async def keyword_search(
+    q: str = Query(..., min_length=1, description="Words to match in title, ingredients or instructions (prefixes allowed)"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    Full-text recipe search ranked by BM25, with highlighted snippets.
+    Requires Authentication.
+    """
+    try:
+        return await run_blocking("db", queries.search_recipes_text, db, q, limit, offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.post("/api/recipes/by-ingredients", response_model=List[PantryMatch])
+async def recipes_by_ingredients(
+    body: PantryRequest,
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    "What can I cook with these": rank recipes by the fraction of their ingredients in the pantry.
+    Requires Authentication.
+    """
+    from services.ingredient_index import recipes_for_pantry
+    try:
+        return await run_blocking("db", recipes_for_pantry, db, body.ingredients, body.limit, body.max_missing)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        conn.close()
 
 @app.get("/api/recipes/{recipe_id}", response_model=Recipe)
 async def get_recipe_by_id(
     recipe_id: int,
-    user = Depends(verify_token)
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
 ):
     """
     Fetch a single recipe by its ID.
     Requires Authentication.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
-        row = cursor.fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail="Recipe not found")
-        return dict(row)
-    except HTTPException:
-        raise
+        recipe = await run_blocking("db", queries.get_recipe, db, recipe_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        conn.close()
-
-# Serve recipe images from Backend/images; files must be named {image_name}.jpg to match CSV Image_Name
-IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
-
+    if recipe is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return recipe
 
 def _resolve_image_path(image_name: str) -> Optional[str]:
     """Resolve image_name to full file path. Tries exact match then case-insensitive. Returns None if not found."""
-    image_name = (image_name or "").strip()
-    if not image_name or ".." in image_name or "/" in image_name or "\\" in image_name:
-        return None
-    base = image_name if image_name.lower().endswith(".jpg") else f"{image_name}.jpg"
-    file_path = os.path.join(IMAGES_DIR, base)
-    if os.path.isfile(file_path):
-        return file_path
-    # Case-insensitive lookup (e.g. on Linux)
-    if os.path.isdir(IMAGES_DIR):
-        target = base.lower()
-        for name in os.listdir(IMAGES_DIR):
-            if name.lower() == target:
-                return os.path.join(IMAGES_DIR, name)
-    return None
+    return image_index.resolve(image_name)
+
+
+async def _serve_image(request: Request, file_path: str, w: Optional[int], format: str, immutable: bool = True):
+    """
+    Original or resized variant, with ETag caching and 304s (see services/http_cache.py).
+    immutable=False makes clients revalidate, for URLs whose image can change. 404 if the file is gone.
+    """
+    from services.thumbnails import FORMATS, get_derivative
+    try:
+        if w is None and format == "jpeg":
+            return await run_blocking("image", cached_file_response, request, file_path, "image/jpeg",
+                                      immutable=immutable)
+        try:
+            derivative = await run_blocking("image", get_derivative, file_path, w, format)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Could not process image: {str(e)}")
+        return await run_blocking("image", cached_file_response, request, derivative, FORMATS[format][1],
+                                  immutable=immutable)
+    except FileNotFoundError:
+        # Stale recipe_images row, or the file was removed after the index was built
+        raise HTTPException(status_code=404, detail="Image not found")
 
 
 @app.get("/images/{image_name:path}")
-async def get_recipe_image(image_name: str):
-    """Serve recipe image by name. Expects image_name (with or without .jpg). Rejects path traversal."""
-    file_path = _resolve_image_path(image_name)
+async def get_recipe_image(
+    request: Request,
+    image_name: str,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Resize to this width (rounded up to a cached size)"),
+    format: str = Query("jpeg", pattern="^(jpeg|webp)$"),
+):
+    """
+    Serve recipe image by name. Expects image_name (with or without .jpg). Rejects path traversal.
+    ?w= and ?format=webp return a cached resized/re-encoded variant (see services/thumbnails.py).
+    """
+    # May rescan images/ when the directory changed, so keep it off the event loop
+    file_path = await run_blocking("image", _resolve_image_path, image_name)
     if not file_path:
         raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path, media_type="image/jpeg")
+    return await _serve_image(request, file_path, w, format)
+
+
+@app.get("/api/recipes/{recipe_id}/image")
+async def get_recipe_image_by_id(
+    request: Request,
+    recipe_id: int,
+    w: Optional[int] = Query(None, ge=1, le=4096),
+    format: str = Query("jpeg", pattern="^(jpeg|webp)$"),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    Serve a recipe's image using the file resolved at ingestion (same w/format options as /images).
+    A sync can point the recipe at a different image, so this URL is revalidated rather than immutable.
+    """
+    file_name = await run_blocking("db", queries.get_recipe_image_file, db, recipe_id)
+    if not file_name:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return await _serve_image(request, image_index.path(file_name), w, format, immutable=False)
 
 
 @app.post("/api/recipes/{recipe_id}/chat")
@@ -180,29 +328,22 @@ async def recipe_chat(
     recipe_id: int,
     body: ChatRequest,
     user=Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
 ):
     """
     Chat about a recipe using RAG (recipe context) with Tavily fallback when the recipe doesn't contain the answer.
     Requires Authentication.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
-        row = cursor.fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail="Recipe not found")
-        recipe = dict(row)
-    except HTTPException:
-        raise
+        recipe = await run_blocking("db", queries.get_recipe, db, recipe_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        conn.close()
+    if recipe is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
 
     try:
         from services.rag_chain import answer_with_rag_or_tavily
-        response_text = answer_with_rag_or_tavily(recipe, body.message)
+        response_text = await run_blocking("llm", answer_with_rag_or_tavily, recipe, body.message)
         return {"response": response_text}
     except Exception as e:
         raise HTTPException(
@@ -211,64 +352,143 @@ async def recipe_chat(
         )
 
 
-@app.get("/api/favorites", response_model=List[int])
+async def _sse_events(events):
+    """Advance a blocking event iterator in the llm pool and format each event as Server-Sent Events."""
+    done = object()
+    try:
+        while True:
+            event = await run_blocking("llm", next, events, done)
+            if event is done:
+                break
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    except Exception as e:
+        error = {"type": "error", "detail": f"Error generating chat response: {str(e)}"}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+
+@app.post("/api/recipes/{recipe_id}/chat/stream")
+async def recipe_chat_stream(
+    recipe_id: int,
+    body: ChatRequest,
+    user=Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    Streaming variant of /chat over Server-Sent Events: emits phase, token, done (or error) events
+    as the RAG answer and the optional web-search answer are generated.
+    Requires Authentication.
+    """
+    try:
+        recipe = await run_blocking("db", queries.get_recipe, db, recipe_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if recipe is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+
+    from services.rag_chain import stream_with_rag_or_tavily
+    return StreamingResponse(
+        _sse_events(stream_with_rag_or_tavily(recipe, body.message)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/favorites", response_model=Union[List[int], List[RecipeSummary]], response_model_exclude_unset=True)
 async def get_favorites(
-    user = Depends(verify_token)
+    response: Response,
+    expand: Optional[str] = Query(None, pattern="^summary$", description="summary: return id, title and image_name"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all favorites"),
+    after_id: Optional[int] = Query(None, description="Keyset cursor: return favorites with recipe id greater than this"),
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    Get the recipes favorited by the current user, ordered by recipe id: IDs by default, or
+    recipe summaries with ?expand=summary. Paginated like /api/recipes (X-Next-Cursor header).
+    """
+    # Assuming verify_token returns a user dict with 'uid' or similar from Firebase
+    user_id = user.get('uid')
+    fetch = queries.get_favorite_summaries if expand == "summary" else queries.get_favorite_ids
+    try:
+        favorites = await run_blocking("db", fetch, db, user_id, after_id, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if limit is not None and len(favorites) == limit:
+        last = favorites[-1]
+        response.headers["X-Next-Cursor"] = str(last["id"] if expand == "summary" else last)
+    return favorites
+
+@app.post("/api/favorites/batch", response_model=FavoritesBatchResult)
+async def update_favorites(
+    body: FavoritesBatchRequest,
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
 ):
     """
-    Get list of recipe IDs favorited by the current user.
+    Favorite the recipes in `add` and unfavorite those in `remove`, in one transaction.
+    Returns how many favorites were actually added and removed.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if set(body.add) & set(body.remove):
+        raise HTTPException(status_code=400, detail="A recipe cannot be both added and removed")
+    user_id = user.get('uid')
     try:
-        # Assuming verify_token returns a user dict with 'uid' or similar from Firebase
-        user_id = user.get('uid')
-        print(f"DEBUG: Fetching favorites for User ID: {user_id}")
-        cursor.execute("SELECT recipe_id FROM favorites WHERE user_id = ?", (user_id,))
-        rows = cursor.fetchall()
-        favorites = [row['recipe_id'] for row in rows]
-        print(f"DEBUG: Found favorites: {favorites}")
-        return favorites
+        added, removed = await run_blocking("db", queries.update_favorites, db, user_id, body.add, body.remove)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        conn.close()
+    return {"added": added, "removed": removed}
+
+@app.put("/api/favorites/{recipe_id}")
+async def add_favorite(
+    recipe_id: int,
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    Favorite a recipe (idempotent: repeating it is a no-op).
+    Returns {"favorited": true, "changed": boolean}.
+    """
+    user_id = user.get('uid')
+    try:
+        added = await run_blocking("db", queries.add_favorite, db, user_id, recipe_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if added is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return {"favorited": True, "changed": added}
+
+@app.delete("/api/favorites/{recipe_id}")
+async def remove_favorite(
+    recipe_id: int,
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
+):
+    """
+    Unfavorite a recipe (idempotent: removing a non-favorite is a no-op).
+    Returns {"favorited": false, "changed": boolean}.
+    """
+    user_id = user.get('uid')
+    try:
+        removed = await run_blocking("db", queries.remove_favorite, db, user_id, recipe_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return {"favorited": False, "changed": removed}
 
 @app.post("/api/favorites/{recipe_id}")
 async def toggle_favorite(
     recipe_id: int,
-    user = Depends(verify_token)
+    user = Depends(verify_token),
+    db: ConnectionPool = Depends(get_pool),
 ):
     """
     Toggle favorite status for a recipe. 
     Returns {"favorited": boolean}.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    user_id = user.get('uid')
     try:
-        user_id = user.get('uid')
-        print(f"DEBUG: Toggling favorite. User ID: {user_id}, Recipe ID: {recipe_id}")
-        
-        # Check if already favorited
-        cursor.execute("SELECT 1 FROM favorites WHERE user_id = ? AND recipe_id = ?", (user_id, recipe_id))
-        exists = cursor.fetchone()
-        
-        if exists:
-            # Remove favorite
-            cursor.execute("DELETE FROM favorites WHERE user_id = ? AND recipe_id = ?", (user_id, recipe_id))
-            favorited = False
-        else:
-            # Add favorite
-            cursor.execute("INSERT INTO favorites (user_id, recipe_id) VALUES (?, ?)", (user_id, recipe_id))
-            favorited = True
-            
-        conn.commit()
+        favorited = await run_blocking("db", queries.toggle_favorite, db, user_id, recipe_id)
         return {"favorited": favorited}
     except Exception as e:
-        conn.rollback()
         print(f"ERROR in toggle_favorite: {e}") # Debug print
         import traceback
         traceback.print_exc() # Print full stack trace
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        conn.close()
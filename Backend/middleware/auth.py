@@ -4,7 +4,13 @@ import os
 from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import auth, credentials
+import jwt
 import requests
+from typing import Optional
+
+from services.executor import run_blocking
+from services.firebase_jwt import FirebaseTokenVerifier, KeyFetchError
+from services.token_cache import token_cache, token_expiry
 
 # Load environment variables
 load_dotenv()
@@ -44,6 +50,34 @@ if not firebase_admin._apps:
         print(f"Warning: Firebase Admin initialization error: {e}")
         print("Token verification will be attempted but may fail without proper credentials.")
 
+# Reused by the REST fallback so verification keeps its TLS connection to Google open
+_session = requests.Session()
+REST_VERIFY_TIMEOUT = 10
+
+# AUTH_VERIFIER=local checks token signatures against Google's cached public keys (no network per
+# request); "firebase" always uses the Admin SDK / REST path below. Local needs projectId.
+AUTH_VERIFIER = os.getenv("AUTH_VERIFIER", "local")
+local_verifier = (
+    FirebaseTokenVerifier(os.getenv("projectId"))
+    if AUTH_VERIFIER == "local" and os.getenv("projectId") else None
+)
+
+# Rejections that are final for a token and safe to remember (not network or server errors)
+_REJECTION_DETAILS = {"Invalid Authentication Token", "Expired Authentication Token"}
+
+
+# Identity Toolkit error codes (400 responses) that mean the token itself is not acceptable
+_REST_REJECTION_CODES = {"INVALID_ID_TOKEN", "TOKEN_EXPIRED", "USER_NOT_FOUND"}
+
+
+def _rest_error_code(response) -> str:
+    """Error code of an Identity Toolkit error body, e.g. "TOKEN_EXPIRED" (may carry a ": detail" suffix)."""
+    try:
+        message = response.json().get("error", {}).get("message", "")
+    except (ValueError, AttributeError):
+        return ""
+    return str(message).split(":", 1)[0].strip()
+
 
 def verify_token_with_rest_api(id_token: str) -> dict:
     """
@@ -53,8 +87,8 @@ def verify_token_with_rest_api(id_token: str) -> dict:
     try:
         # Use Google's token verification endpoint
         url = f"https://www.googleapis.com/identitytoolkit/v3/relyingparty/getAccountInfo?key={os.getenv('apiKey')}"
-        response = requests.post(url, json={"idToken": id_token})
-        
+        response = _session.post(url, json={"idToken": id_token}, timeout=REST_VERIFY_TIMEOUT)
+
         if response.status_code == 200:
             data = response.json()
             if 'users' in data and len(data['users']) > 0:
@@ -64,16 +98,25 @@ def verify_token_with_rest_api(id_token: str) -> dict:
                     "email": user.get("email"),
                     "name": user.get("displayName"),
                 }
-        
-        raise HTTPException(status_code=401, detail="Invalid Authentication Token")
+            raise HTTPException(status_code=401, detail="Token verification failed: no user in response")
+
+        # Only a 400 naming the token as bad is a final (cacheable) rejection. Quota (429),
+        # API key / permission (403) and server errors say nothing about the token.
+        if response.status_code == 400:
+            code = _rest_error_code(response)
+            if code == "TOKEN_EXPIRED":
+                raise HTTPException(status_code=401, detail="Expired Authentication Token")
+            if code in _REST_REJECTION_CODES:
+                raise HTTPException(status_code=401, detail="Invalid Authentication Token")
+        raise HTTPException(status_code=401, detail=f"Token verification failed: HTTP {response.status_code}")
     except requests.RequestException as e:
         raise HTTPException(status_code=401, detail=f"Token verification failed: {str(e)}")
 
 
-def verify_token(request: Request):
+async def verify_token(request: Request):
     """
     Verifies the Firebase authentication token and returns the decoded user information.
-    Extracts the unique user ID (uid) from the Firebase token.
+    Verification blocks (Admin SDK key fetches, REST fallback), so it runs in the "auth" pool.
     """
     auth_header = request.headers.get('Authorization')
     if not auth_header:
@@ -81,8 +124,53 @@ def verify_token(request: Request):
     
     # Extract token from "Bearer <token>" format
     token = auth_header.split(" ")[1] if " " in auth_header else auth_header
-    
-    # Try Firebase Admin SDK first
+    return await run_blocking("auth", verify_id_token, token)
+
+
+def verify_id_token(token: str) -> dict:
+    """
+    Verifies a Firebase ID token and returns the user information.
+    Results are cached (see services/token_cache.py): verified tokens until they expire,
+    rejected ones briefly.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        user, detail = cached
+        if user is None:
+            raise HTTPException(status_code=401, detail=detail)
+        return user
+
+    try:
+        user, expires_at = _verify_id_token_uncached(token)
+    except HTTPException as e:
+        if e.detail in _REJECTION_DETAILS:
+            token_cache.reject(token, e.detail)
+        raise
+    token_cache.add(token, user, expires_at)
+    return user
+
+
+def _verify_id_token_uncached(token: str) -> tuple[dict, Optional[float]]:
+    """
+    Verifies a Firebase ID token and returns (user information, expiry timestamp).
+    Extracts the unique user ID (uid) from the Firebase token.
+    """
+    if local_verifier is not None:
+        try:
+            claims = local_verifier.verify(token)
+            return {
+                "uid": claims["uid"],
+                "email": claims.get("email"),
+                "name": claims.get("name"),
+            }, claims["exp"]
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Expired Authentication Token")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Invalid Authentication Token")
+        except KeyFetchError as e:
+            print(f"DEBUG: Local verification unavailable: {e}, trying Admin SDK")
+
+    # Try Firebase Admin SDK next
     try:
         # Verify the Firebase ID token
         decoded_token = auth.verify_id_token(token)
@@ -94,7 +182,7 @@ def verify_token(request: Request):
             "uid": uid,
             "email": decoded_token.get("email"),
             "name": decoded_token.get("name"),
-        }
+        }, decoded_token.get("exp")
     except auth.InvalidIdTokenError:
         print("DEBUG: Invalid ID Token (Admin SDK)")
         raise HTTPException(status_code=401, detail="Invalid Authentication Token")
@@ -106,4 +194,4 @@ def verify_token(request: Request):
         print(f"DEBUG: Admin SDK verification failed: {e}, trying REST API fallback")
         result = verify_token_with_rest_api(token)
         print(f"DEBUG: Auth Success (REST API). UID: {result.get('uid')}")
-        return result
+        return result, token_expiry(token)
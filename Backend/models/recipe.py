@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class Recipe(BaseModel):
     id: int
@@ -11,3 +11,62 @@ class Recipe(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class RecipeSummary(BaseModel):
+    """Lightweight recipe projection for listings. Only the requested columns are set."""
+    id: int
+    title: Optional[str] = None
+    image_name: Optional[str] = None
+    ingredients: Optional[str] = None
+    instructions: Optional[str] = None
+    cleaned_ingredients: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RecipeSearchResult(BaseModel):
+    """A recipe summary with its relevance score from a search endpoint."""
+    id: int
+    title: str
+    image_name: Optional[str] = None
+    score: float
+
+
+class RecipeTextSearchResult(RecipeSearchResult):
+    """Keyword search hit with highlighted title and a matching snippet (<mark> tags)."""
+    title_highlight: Optional[str] = None
+    snippet: Optional[str] = None
+
+
+class PantryRequest(BaseModel):
+    ingredients: List[str] = Field(..., min_length=1, max_length=100)
+    limit: int = Field(20, ge=1, le=100)
+    max_missing: Optional[int] = Field(None, ge=0)
+
+
+class PantryMatch(BaseModel):
+    """A recipe ranked by how much of its ingredient list the pantry covers."""
+    id: int
+    title: str
+    image_name: Optional[str] = None
+    coverage: float
+    matched: int
+    missing: int
+    total: int
+
+
+class FavoritesBatchRequest(BaseModel):
+    """Recipes to favorite and unfavorite in one transaction."""
+    add: List[int] = Field(default_factory=list, max_length=500)
+    remove: List[int] = Field(default_factory=list, max_length=500)
+
+
+class FavoritesBatchResult(BaseModel):
+    added: int
+    removed: int
+
+
+# Columns a client may request through the `fields=` projection on listing endpoints
+RECIPE_FIELDS = ("id", "title", "ingredients", "instructions", "image_name", "cleaned_ingredients")
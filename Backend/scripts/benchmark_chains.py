@@ -0,0 +1,63 @@
+"""
+Micro-benchmark: per-request prompt/chain construction vs the cached chains in services/rag_chain.py.
+Uses a fake LLM, so it measures only LangChain overhead (no network).
+
+Usage:
+    python scripts/benchmark_chains.py [iterations]
+"""
+import os
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from services import rag_chain
+
+INPUTS = {"context": "Recipe title: Banana Bread\n\nInstructions: Bake 60 minutes.", "question": "How long to bake?"}
+
+
+def build_per_request(llm):
+    """What every chat request did before: rebuild the prompt and compose the chain."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", rag_chain.RAG_SYSTEM),
+        ("human", rag_chain.RAG_USER_TEMPLATE),
+    ])
+    return prompt | llm | StrOutputParser()
+
+
+def cached(llm):
+    return rag_chain._get_chain("rag", llm)
+
+
+def timed(label: str, fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations * 1e6
+    print(f"{label:<36}{per_call:>10.1f} us")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    llm = FakeListChatModel(responses=["Bake for 60 minutes."])
+    print(f"{iterations} iterations, fake LLM")
+
+    build = timed("construct per request", lambda: build_per_request(llm), iterations)
+    reuse = timed("cached chain lookup", lambda: cached(llm), iterations)
+    build_invoke = timed("construct + invoke", lambda: build_per_request(llm).invoke(INPUTS), iterations)
+    reuse_invoke = timed("cached + invoke", lambda: cached(llm).invoke(INPUTS), iterations)
+
+    print()
+    print(f"Construction saved per chain: {build - reuse:.1f} us")
+    print(f"Saved per invoke: {build_invoke - reuse_invoke:.1f} us "
+          f"(a chat request runs 1-3 chains)")
+
+
+if __name__ == "__main__":
+    main()
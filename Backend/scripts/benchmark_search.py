@@ -0,0 +1,80 @@
+"""
+Benchmark recall against latency for the semantic search index (services/search_index.py).
+Compares exact brute-force search with the IVF index at several nprobe values.
+
+Usage:
+    python scripts/benchmark_search.py            # synthetic clustered vectors (offline)
+    python scripts/benchmark_search.py --db       # vectors from recipe_embeddings
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from services.search_index import RecipeSearchIndex
+
+K = 10
+N_QUERIES = 200
+N_LISTS = 64
+NPROBES = (1, 2, 4, 8, 16, 32)
+
+
+def synthetic_index(n_recipes: int = 13500, chunks: int = 3, dim: int = 768, clusters: int = 200, seed: int = 0):
+    """Clustered random vectors roughly shaped like the recipe catalog (3 chunks per recipe)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=n_recipes * chunks)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(n_recipes * chunks, dim))
+    recipe_ids = np.repeat(np.arange(1, n_recipes + 1), chunks)
+    return RecipeSearchIndex(vectors.astype(np.float32), recipe_ids)
+
+
+def db_index():
+    from database.connection import get_db_connection
+    conn = get_db_connection()
+    index = RecipeSearchIndex.from_db(conn)
+    conn.close()
+    return index
+
+
+def run(index: RecipeSearchIndex, queries: np.ndarray, nprobe: int):
+    """Return (results per query, mean latency in ms)."""
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append([recipe_id for recipe_id, _ in index.search(q, K, nprobe=nprobe)])
+    elapsed = (time.perf_counter() - start) / len(queries)
+    return results, elapsed * 1000
+
+
+def main():
+    index = db_index() if "--db" in sys.argv else synthetic_index()
+    if len(index) == 0:
+        print("No vectors to benchmark. Build the index with: python scripts/populate_db.py --embed-only")
+        return
+    print(f"Index: {len(index)} chunk vectors, dim {index.vectors.shape[1]}")
+
+    # Queries: perturbed copies of random indexed vectors
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(index), N_QUERIES, replace=False)
+    queries = index.vectors[picks] + 0.1 * rng.normal(size=index.vectors[picks].shape).astype(np.float32)
+
+    exact, exact_ms = run(index, queries, nprobe=0)
+    print(f"{'mode':<14}{'recall@' + str(K):>10}{'ms/query':>12}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms:>12.3f}")
+
+    start = time.perf_counter()
+    index.build_ivf(N_LISTS)
+    print(f"(IVF build with {N_LISTS} lists: {time.perf_counter() - start:.2f}s)")
+    for nprobe in NPROBES:
+        approx, ms = run(index, queries, nprobe)
+        recall = np.mean([len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(approx, exact)])
+        print(f"{'ivf nprobe=' + str(nprobe):<14}{recall:>10.3f}{ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
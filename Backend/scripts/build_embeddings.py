@@ -0,0 +1,90 @@
+"""
+Precompute chunk embeddings for every recipe with several workers under a requests-per-minute
+limit (services/embedding_builder.py). Rate limit / quota errors are retried with backoff. Each
+batch is committed as it completes, so re-running after a crash or Ctrl-C picks up where the last
+run stopped.
+
+Usage:
+    python scripts/build_embeddings.py [--workers 4] [--batch-size 100] [--rpm 300]
+    python scripts/build_embeddings.py --changes database/last_sync_changes.json   # after populate_db.py --sync
+    python scripts/build_embeddings.py --fake --db /tmp/recipes_copy.db            # offline, deterministic vectors
+"""
+import argparse
+import os
+import sys
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import database.connection as connection
+from services.embedding_builder import (
+    EMBED_MAX_RETRIES, EMBED_RPM, EMBED_WORKERS, FAKE_EMBEDDING_DIM, FAKE_EMBEDDING_MODEL, FakeEmbeddings,
+    build_index,
+)
+from services.embedding_index import EMBED_BATCH_SIZE
+from services.recipe_sync import ChangeSet
+from services.vector_store import EMBEDDING_MODEL, _get_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the recipe embedding index in parallel.")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="Concurrent embed_documents calls")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunk texts per call")
+    parser.add_argument("--rpm", type=float, default=EMBED_RPM, help="Requests per minute across all workers")
+    parser.add_argument("--max-retries", type=int, default=EMBED_MAX_RETRIES, help="Retries per batch on 429 / quota errors")
+    parser.add_argument("--changes", help="Only embed recipes added or updated by a sync (change set JSON)")
+    parser.add_argument("--limit", type=int, help="Only consider the first N recipes")
+    parser.add_argument("--db", default=connection.DB_PATH, help="SQLite database to index")
+    parser.add_argument("--fake", action="store_true",
+                        help=f"Use the deterministic offline model (vectors stored as model '{FAKE_EMBEDDING_MODEL}')")
+    parser.add_argument("--fake-dim", type=int, default=FAKE_EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    if args.fake:
+        if os.path.abspath(args.db) == os.path.abspath(connection.DB_PATH):
+            # Fake vectors would overwrite the real ones (one row per recipe chunk)
+            print("Error: --fake needs --db pointing at a scratch copy of the database.")
+            sys.exit(1)
+        embeddings, model = FakeEmbeddings(dim=args.fake_dim), FAKE_EMBEDDING_MODEL
+    else:
+        embeddings, model = _get_embeddings(), EMBEDDING_MODEL
+        if embeddings is None:
+            print("Error: GOOGLE_API_KEY is not set; cannot build the embedding index (use --fake to test offline).")
+            sys.exit(1)
+
+    connection.DB_PATH = args.db
+    connection.init_db()
+    conn = connection.get_db_connection()
+    query = "SELECT * FROM recipes ORDER BY id"
+    if args.limit:
+        query += f" LIMIT {int(args.limit)}"
+    recipes = (dict(row) for row in conn.execute(query).fetchall())
+    if args.changes:
+        wanted = set(ChangeSet.load(args.changes).touched)
+        recipes = (recipe for recipe in recipes if recipe["id"] in wanted)
+
+    print(f"Embedding stale chunks with {args.workers} workers, batches of {args.batch_size}, "
+          f"{args.rpm:g} requests/min, model {model}")
+
+    def progress(stats):
+        if stats.batches % 10 == 0:
+            print(f"  {stats.embedded} chunks embedded ({stats.batches} batches, {stats.recipes} recipes scanned)")
+
+    try:
+        stats = build_index(conn, recipes, embeddings, model=model, workers=args.workers,
+                            batch_size=args.batch_size, rpm=args.rpm, max_retries=args.max_retries,
+                            progress=progress)
+    except KeyboardInterrupt:
+        print("Interrupted; finished batches are saved. Re-run to resume.")
+        sys.exit(130)
+    except Exception as e:
+        print(f"Error: {e}")
+        print("Finished batches are saved. Re-run to resume.")
+        sys.exit(1)
+    finally:
+        conn.close()
+    print(f"Done: {stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
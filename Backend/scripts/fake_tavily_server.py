@@ -0,0 +1,91 @@
+"""
+Local stand-in for the Tavily search API, for testing the search cache without network or quota.
+Answers POST /search with canned results and counts requests; --delay slows each response so
+concurrent identical searches overlap.
+
+Point the backend at it with:
+    TAVILY_API_KEY=fake TAVILY_API_BASE_URL=http://127.0.0.1:8765
+
+Usage:
+    python scripts/fake_tavily_server.py [--port 8765] [--delay 0.2]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTavilyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay: float = 0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.delay = delay
+        self.requests = 0
+        self.queries: list[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeTavilyServer":
+        """Serve from a background thread (for use inside test scripts)."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def record(self, query: str) -> None:
+        with self._lock:
+            self.requests += 1
+            self.queries.append(query)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeTavilyServer
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/search":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        query = body.get("query", "")
+        self.server.record(query)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        results = [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "content": f"Fake content {i + 1} about {query}.",
+                "url": f"https://example.com/{i + 1}",
+                "score": 1.0 - i * 0.1,
+            }
+            for i in range(int(body.get("max_results", 5)))
+        ]
+        payload = json.dumps({"query": query, "results": results, "response_time": self.server.delay}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each response")
+    args = parser.parse_args()
+    server = FakeTavilyServer(args.port, args.delay)
+    print(f"Fake Tavily API on {server.url} (POST /search)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Served {server.requests} search requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Pre-generate resized / WebP image variants into the derivative cache (services/thumbnails.py),
+so the first dashboard visit doesn't pay for resizing. Existing derivatives are reused, so the
+script can be re-run after adding images. Prints the total size of each variant vs the originals.
+
+Usage:
+    python scripts/generate_thumbnails.py [--widths 320,640] [--formats webp,jpeg] [--workers N]
+    python scripts/generate_thumbnails.py --changes database/last_sync_changes.json   # after populate_db.py --sync
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from services.image_index import image_index
+from services.recipe_sync import ChangeSet
+from services.thumbnails import IMAGE_CACHE_DIR, get_derivative, snap_width
+
+IMAGES_DIR = os.path.join(backend_dir, "images")
+
+
+def generate(job: tuple[str, list[int], list[str]]) -> tuple[dict, int]:
+    """Build the missing variants of one image. Returns ({(fmt, width): bytes}, failures)."""
+    source, widths, formats = job
+    sizes = {}
+    failed = 0
+    for fmt in formats:
+        for width in widths:
+            try:
+                sizes[(fmt, width)] = os.path.getsize(get_derivative(source, width, fmt))
+            except Exception as e:
+                print(f"  Could not process {os.path.basename(source)}: {e}")
+                failed += 1
+    return sizes, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--widths", default="320", help="Comma-separated widths (rounded up to IMAGE_WIDTHS)")
+    parser.add_argument("--formats", default="webp", help="Comma-separated formats: webp, jpeg")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--limit", type=int, help="Only process the first N images")
+    parser.add_argument("--changes", help="Only process images of recipes added or updated by a sync (change set JSON)")
+    args = parser.parse_args()
+
+    widths = sorted({snap_width(int(w)) for w in args.widths.split(",")})
+    formats = [f.strip() for f in args.formats.split(",")]
+    if args.changes:
+        resolved = (image_index.resolve(name) for name in ChangeSet.load(args.changes).images)
+        sources = sorted({path for path in resolved if path})[: args.limit]
+    else:
+        sources = sorted(
+            os.path.join(IMAGES_DIR, name) for name in os.listdir(IMAGES_DIR) if name.lower().endswith(".jpg")
+        )[: args.limit]
+    print(f"Generating widths {widths} as {formats} for {len(sources)} images into {IMAGE_CACHE_DIR}")
+
+    start = time.perf_counter()
+    totals = {(fmt, width): 0 for fmt in formats for width in widths}
+    failed = 0
+    jobs = [(source, widths, formats) for source in sources]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for i, (sizes, failures) in enumerate(pool.map(generate, jobs, chunksize=32), 1):
+            for variant, size in sizes.items():
+                totals[variant] += size
+            failed += failures
+            if i % 1000 == 0:
+                print(f"  {i}/{len(jobs)} images ({i / (time.perf_counter() - start):.0f}/s)")
+    print(f"Done in {time.perf_counter() - start:.1f}s, {failed} failed")
+
+    if not sources:
+        return
+    source_bytes = sum(os.path.getsize(source) for source in sources)
+    print(f"Originals: {source_bytes / 1e6:.1f} MB")
+    for (fmt, width), size in totals.items():
+        print(f"  {fmt} w={width}: {size / 1e6:.1f} MB ({source_bytes / max(1, size):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Cache for RAG chat answers, keyed by recipe id, recipe content hash and normalized question.
+Two backends share one interface: an in-process LRU (per worker) and a SQLite table that all
+workers on a host can share. Both expire entries after a TTL and evict least-recently-used
+entries beyond a size bound.
+
+Configure with ANSWER_CACHE_BACKEND (memory | sqlite | off), ANSWER_CACHE_TTL (seconds),
+ANSWER_CACHE_SIZE (entries) and ANSWER_CACHE_PATH (SQLite file).
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+from database.pool import ConnectionPool
+from services.vector_store import recipe_to_chunks
+
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 2000))
+ANSWER_CACHE_PATH = os.getenv(
+    "ANSWER_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "answer_cache.db"),
+)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop surrounding punctuation."""
+    question = re.sub(r"\s+", " ", question.lower()).strip()
+    return question.strip(" ?!.,;:")
+
+
+def recipe_content_hash(recipe: dict[str, Any]) -> str:
+    """Hash of the recipe text the answer was generated from; edits to the recipe miss the cache."""
+    return hashlib.sha256("\n\n".join(recipe_to_chunks(recipe)).encode("utf-8")).hexdigest()
+
+
+def answer_cache_key(recipe: dict[str, Any], question: str) -> str:
+    raw = f"{recipe.get('id')}\x00{recipe_content_hash(recipe)}\x00{normalize_question(question)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache(ABC):
+    """Base class: subclasses implement _get/_set (checked at construction); hit and miss counting lives here."""
+
+    def __init__(self, ttl: float = ANSWER_CACHE_TTL, max_entries: int = ANSWER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._set(key, value)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """Unexpired value for key, or None."""
+
+    @abstractmethod
+    def _set(self, key: str, value: str) -> None:
+        """Store value under key for ttl seconds, evicting beyond max_entries."""
+
+
+class MemoryAnswerCache(AnswerCache):
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, ttl: float = ANSWER_CACHE_TTL, max_entries: int = ANSWER_CACHE_SIZE):
+        super().__init__(ttl, max_entries)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteAnswerCache(AnswerCache):
+    """Cache table in a SQLite file, shared by every worker process that points at it."""
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_SIZE):
+        super().__init__(ttl, max_entries)
+        self.pool = ConnectionPool(path)
+        conn = self.pool.connection()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS answer_cache (
+                    key TEXT PRIMARY KEY,
+                    answer TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_last_access ON answer_cache (last_access)")
+
+    def _get(self, key: str) -> Optional[str]:
+        conn = self.pool.connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT answer, expires_at FROM answer_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            if row["expires_at"] <= now:
+                conn.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE answer_cache SET last_access = ? WHERE key = ?", (now, key))
+        return row["answer"]
+
+    def _set(self, key: str, value: str) -> None:
+        conn = self.pool.connection()
+        now = time.time()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO answer_cache (key, answer, expires_at, last_access) VALUES (?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    answer = excluded.answer,
+                    expires_at = excluded.expires_at,
+                    last_access = excluded.last_access
+                """,
+                (key, value, now + self.ttl, now),
+            )
+            conn.execute("DELETE FROM answer_cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                """
+                DELETE FROM answer_cache WHERE key IN (
+                    SELECT key FROM answer_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the configured process-wide cache, or None when ANSWER_CACHE_BACKEND=off."""
+    global _cache
+    if ANSWER_CACHE_BACKEND == "off":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if ANSWER_CACHE_BACKEND == "sqlite":
+                    _cache = SQLiteAnswerCache()
+                else:
+                    _cache = MemoryAnswerCache()
+    return _cache
@@ -0,0 +1,99 @@
+"""
+Process-wide registry of external API clients (Gemini chat model, Gemini embeddings, Tavily).
+Each client is built once and reused, so requests share its HTTP connection pool instead of
+paying a fresh client, TLS handshake and auth setup per call. warm_clients() builds them all
+at startup. A client whose API key is missing is cached as None.
+"""
+import os
+import threading
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_MODEL = "gemini-2.5-flash-lite"
+# Gemini embedding; use "models/gemini-embedding-001" if needed. Stored vectors are tagged with it.
+EMBEDDING_MODEL = "models/embedding-001"
+
+_clients: dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def _get_or_build(name: str, build: Callable[[], Any]) -> Any:
+    if name not in _clients:
+        with _lock:
+            if name not in _clients:
+                _clients[name] = build()
+    return _clients[name]
+
+
+def _build_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    return ChatGoogleGenerativeAI(
+        model=LLM_MODEL,
+        google_api_key=api_key,
+        temperature=0.2,
+    )
+
+
+def _build_embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    return GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        google_api_key=api_key,
+    )
+
+
+def _build_tavily():
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        return None
+    from tavily import TavilyClient
+    # TAVILY_API_BASE_URL points the client at another server, e.g. scripts/fake_tavily_server.py
+    base_url = os.getenv("TAVILY_API_BASE_URL")
+    if base_url:
+        return TavilyClient(api_key=api_key, api_base_url=base_url)
+    return TavilyClient(api_key=api_key)
+
+
+def get_llm():
+    """Shared ChatGoogleGenerativeAI, or None if GOOGLE_API_KEY is not set."""
+    return _get_or_build("llm", _build_llm)
+
+
+def get_embeddings():
+    """Shared GoogleGenerativeAIEmbeddings, or None if GOOGLE_API_KEY is not set."""
+    return _get_or_build("embeddings", _build_embeddings)
+
+
+def get_tavily_client():
+    """Shared TavilyClient, or None if TAVILY_API_KEY is not set."""
+    return _get_or_build("tavily", _build_tavily)
+
+
+def warm_clients() -> dict[str, bool]:
+    """Build every client now (call at startup). Returns which ones are configured."""
+    status = {}
+    for name, getter in (("llm", get_llm), ("embeddings", get_embeddings), ("tavily", get_tavily_client)):
+        try:
+            status[name] = getter() is not None
+        except Exception as e:
+            print(f"WARNING: Could not initialize {name} client: {e}")
+            status[name] = False
+    return status
+
+
+def reset_clients(name: Optional[str] = None) -> None:
+    """Drop cached clients (all, or one by name) so they are rebuilt on next use."""
+    with _lock:
+        if name is None:
+            _clients.clear()
+        else:
+            _clients.pop(name, None)
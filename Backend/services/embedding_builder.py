@@ -0,0 +1,263 @@
+"""
+Parallel offline builder for the recipe embedding index (services/embedding_index.py).
+Stale chunks (see vector_store.recipe_to_chunks) are grouped into batches, and each batch is one
+embed_documents call. Several worker threads send the batches, sharing a token bucket that caps
+requests per minute. Rate limit / quota errors (429, RESOURCE_EXHAUSTED) are retried with
+exponential backoff and jitter, and the whole pool is paused so the other workers back off too.
+
+Only the calling thread writes to SQLite. It saves and commits each batch as it completes, so the
+table itself is the checkpoint: after a crash or Ctrl-C, the next run embeds only the chunks that
+still have no up-to-date vector.
+
+FakeEmbeddings is a deterministic stand-in model (vectors derived from a hash of the text), so the
+builder can be run and tested offline. It can also inject 429s.
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.embedding_index import EMBED_BATCH_SIZE, chunk_hash, save_vectors
+from services.vector_store import EMBEDDING_MODEL, is_quota_error, recipe_to_chunks
+
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", 4))
+# Requests per minute across all workers
+EMBED_RPM = float(os.getenv("EMBED_RPM", 300))
+EMBED_MAX_RETRIES = 6
+# Backoff after the n-th consecutive rate limit error: min(base * 2**n, max), plus up to 50% jitter
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+FAKE_EMBEDDING_MODEL = "fake-embedding"
+FAKE_EMBEDDING_DIM = 768
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`.
+    pause() empties the bucket and holds every caller until the given delay has passed.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        # Time up to which tokens have been accounted for; in the future while paused
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens (possibly going negative) and return how long the caller must wait."""
+        with self._lock:
+            now = self._clock()
+            if now > self._updated:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._tokens -= tokens
+            ready_at = self._updated + max(0.0, -self._tokens) / self.rate
+            return max(0.0, ready_at - now)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available. Returns the time waited."""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            self._sleep(delay)
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._updated = max(self._updated, self._clock() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    delay = min(base * (2 ** attempt), cap)
+    return delay + random.uniform(0, delay / 2)
+
+
+def embed_with_backoff(embeddings: Embeddings, texts: list[str], bucket: Optional[TokenBucket] = None,
+                       max_retries: int = EMBED_MAX_RETRIES, base: float = BACKOFF_BASE,
+                       on_retry: Optional[Callable[[int, float, Exception], None]] = None) -> list[list[float]]:
+    """One embed_documents call, rate limited by bucket and retried on rate limit / quota errors only."""
+    attempt = 0
+    while True:
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if not is_quota_error(e) or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, base)
+            if on_retry is not None:
+                on_retry(attempt + 1, delay, e)
+            if bucket is not None:
+                bucket.pause(delay)
+                bucket.acquire(0)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic offline embedding model: each text maps to a unit vector seeded by its SHA-256,
+    so the same text always gets the same vector. The first `rate_limit_errors` calls raise a
+    429-style error, to exercise the backoff path.
+    """
+
+    model_name = FAKE_EMBEDDING_MODEL
+
+    def __init__(self, dim: int = FAKE_EMBEDDING_DIM, rate_limit_errors: int = 0, latency: float = 0.0):
+        self.dim = dim
+        self.rate_limit_errors = rate_limit_errors
+        self.latency = latency
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.calls += 1
+            if self.rate_limit_errors > 0:
+                self.rate_limit_errors -= 1
+                raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+            self.texts_embedded += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+@dataclass
+class BuildStats:
+    recipes: int = 0
+    chunks: int = 0  # stale chunks found
+    embedded: int = 0  # chunks embedded and committed
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        rate = self.embedded / self.seconds if self.seconds else 0.0
+        return (f"{self.embedded}/{self.chunks} chunks from {self.recipes} recipes in {self.batches} batches, "
+                f"{self.retries} rate-limit retries, {self.seconds:.1f}s ({rate:.0f} chunks/s)")
+
+
+def _stored_hashes(conn: sqlite3.Connection, model: str) -> dict[tuple[int, int], str]:
+    """{(recipe_id, chunk_index): content_hash} for every stored vector of the model, in one query."""
+    return {
+        (recipe_id, chunk_index): content_hash
+        for recipe_id, chunk_index, content_hash in conn.execute(
+            "SELECT recipe_id, chunk_index, content_hash FROM recipe_embeddings WHERE model = ?", (model,)
+        )
+    }
+
+
+def _stale_batches(conn: sqlite3.Connection, recipes: Iterable[dict[str, Any]], model: str,
+                   batch_size: int, stats: BuildStats) -> Iterator[list[tuple[int, int, str]]]:
+    stored = _stored_hashes(conn, model)
+    batch: list[tuple[int, int, str]] = []
+    for recipe in recipes:
+        stats.recipes += 1
+        for chunk_index, text in enumerate(recipe_to_chunks(recipe)):
+            if stored.get((recipe["id"], chunk_index)) == chunk_hash(text):
+                continue
+            stats.chunks += 1
+            batch.append((recipe["id"], chunk_index, text))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def build_index(
+    conn: sqlite3.Connection,
+    recipes: Iterable[dict[str, Any]],
+    embeddings: Embeddings,
+    model: str = EMBEDDING_MODEL,
+    workers: int = EMBED_WORKERS,
+    batch_size: int = EMBED_BATCH_SIZE,
+    rpm: float = EMBED_RPM,
+    max_retries: int = EMBED_MAX_RETRIES,
+    backoff_base: float = BACKOFF_BASE,
+    progress: Optional[Callable[[BuildStats], None]] = None,
+) -> BuildStats:
+    """
+    Embed every stale chunk of `recipes` with `workers` threads under an `rpm` limit, saving vectors
+    under `model`. Each batch is committed when it completes. If a batch fails for good, the batches
+    already in flight are still saved, then the error is raised.
+    """
+    stats = BuildStats()
+    started = time.perf_counter()
+    bucket = TokenBucket(rate=rpm / 60.0, capacity=max(1, workers))
+    retry_lock = threading.Lock()
+
+    def on_retry(attempt: int, delay: float, error: Exception) -> None:
+        with retry_lock:
+            stats.retries += 1
+        print(f"  Rate limited (attempt {attempt}), backing off {delay:.1f}s: {error}")
+
+    def embed(batch):
+        texts = [text for _, _, text in batch]
+        return embed_with_backoff(embeddings, texts, bucket, max_retries, backoff_base, on_retry)
+
+    batches = _stale_batches(conn, recipes, model, batch_size, stats)
+    failure: Optional[Exception] = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as executor:
+        in_flight = {}
+        try:
+            while True:
+                # Keep a couple of batches queued per worker so nobody idles waiting for the writer
+                while failure is None and len(in_flight) < workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    in_flight[executor.submit(embed, batch)] = batch
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    try:
+                        vectors = future.result()
+                    except Exception as e:
+                        failure = failure or e
+                        continue
+                    save_vectors(conn, batch, vectors, model=model)
+                    conn.commit()
+                    stats.batches += 1
+                    stats.embedded += len(batch)
+                    if progress is not None:
+                        progress(stats)
+        except BaseException:
+            # Ctrl-C: drop queued batches; committed ones are kept and the next run resumes after them
+            for future in in_flight:
+                future.cancel()
+            raise
+        finally:
+            stats.seconds = time.perf_counter() - started
+    if failure is not None:
+        raise failure
+    return stats
@@ -0,0 +1,99 @@
+"""
+Persistent recipe embedding index stored in SQLite.
+Each recipe chunk (see vector_store.recipe_to_chunks) is embedded once offline and saved as a
+float32 BLOB keyed by recipe id, chunk index and content hash. Chat requests load the stored
+vectors instead of calling the embedding API for the recipe documents again.
+The index is built by services/embedding_builder.py (scripts/build_embeddings.py).
+"""
+import hashlib
+import sqlite3
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.vector_store import EMBEDDING_MODEL, recipe_to_chunks
+
+# Number of chunk texts sent per embed_documents call when indexing
+EMBED_BATCH_SIZE = 100
+
+
+def chunk_hash(text: str) -> str:
+    """Stable content hash for a chunk; a changed recipe produces new hashes and is re-embedded."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector: Iterable[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def unpack_vector(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def load_recipe_vectors(conn: sqlite3.Connection, recipe: dict[str, Any]) -> Optional[list[list[float]]]:
+    """
+    Return stored vectors for the recipe's current chunks, in chunk order.
+    Returns None if any chunk is missing or stale (content hash or model changed).
+    """
+    chunks = recipe_to_chunks(recipe)
+    rows = conn.execute(
+        "SELECT chunk_index, content_hash, vector FROM recipe_embeddings WHERE recipe_id = ? AND model = ?",
+        (recipe.get("id"), EMBEDDING_MODEL),
+    ).fetchall()
+    stored = {row["chunk_index"]: row for row in rows}
+    vectors = []
+    for i, chunk in enumerate(chunks):
+        row = stored.get(i)
+        if row is None or row["content_hash"] != chunk_hash(chunk):
+            return None
+        vectors.append(unpack_vector(row["vector"]).tolist())
+    return vectors
+
+
+def save_vectors(
+    conn: sqlite3.Connection,
+    items: list[tuple[int, int, str]],
+    vectors: list[list[float]],
+    model: str = EMBEDDING_MODEL,
+) -> None:
+    """Upsert vectors for (recipe_id, chunk_index, text) items. Caller commits."""
+    conn.executemany(
+        """
+        INSERT INTO recipe_embeddings (recipe_id, chunk_index, content_hash, model, dim, vector)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (recipe_id, chunk_index) DO UPDATE SET
+            content_hash = excluded.content_hash,
+            model = excluded.model,
+            dim = excluded.dim,
+            vector = excluded.vector
+        """,
+        [
+            (recipe_id, chunk_index, chunk_hash(text), model, len(vector), pack_vector(vector))
+            for (recipe_id, chunk_index, text), vector in zip(items, vectors)
+        ],
+    )
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Embeddings that answer embed_documents from stored vectors and delegate queries
+    (and any text without a stored vector) to the live model.
+    """
+
+    def __init__(self, vectors: dict[str, list[float]], model: Optional[Embeddings] = None):
+        self.vectors = vectors
+        self.model = model
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        missing = [t for t in texts if t not in self.vectors]
+        if missing:
+            if self.model is None:
+                raise ValueError("No stored vector and no embedding model available")
+            self.vectors.update(zip(missing, self.model.embed_documents(missing)))
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.model is None:
+            raise ValueError("No embedding model available for queries")
+        return self.model.embed_query(text)
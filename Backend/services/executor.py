@@ -0,0 +1,60 @@
+"""
+Bounded thread pools for blocking work (SQLite, auth HTTP calls, LLM chains).
+Route handlers are async, so anything blocking must run here instead of on the event loop.
+Each backend gets its own pool, so a slow Gemini call cannot starve database reads.
+Pool sizes are configurable with DB_MAX_WORKERS, AUTH_MAX_WORKERS, LLM_MAX_WORKERS, WEB_MAX_WORKERS
+and IMAGE_MAX_WORKERS.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+POOL_SIZES = {
+    "db": int(os.getenv("DB_MAX_WORKERS", 8)),
+    "auth": int(os.getenv("AUTH_MAX_WORKERS", 8)),
+    "llm": int(os.getenv("LLM_MAX_WORKERS", 4)),
+    # Background web searches started by chat requests (see services/web_prefetch.py)
+    "web": int(os.getenv("WEB_MAX_WORKERS", 4)),
+    # Thumbnail generation (see services/thumbnails.py)
+    "image": int(os.getenv("IMAGE_MAX_WORKERS", 2)),
+}
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def get_executor(backend: str) -> ThreadPoolExecutor:
+    """Return the pool for a backend ("db", "auth", "llm", "web" or "image"), creating it on first use."""
+    if backend not in POOL_SIZES:
+        raise ValueError(f"Unknown executor backend: {backend}")
+    executor = _executors.get(backend)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(backend)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=POOL_SIZES[backend],
+                    thread_name_prefix=f"{backend}-worker",
+                )
+                _executors[backend] = executor
+    return executor
+
+
+async def run_blocking(backend: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable in the backend's pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(backend), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """Stop all pools (call on application shutdown)."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
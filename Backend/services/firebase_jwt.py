@@ -0,0 +1,190 @@
+"""
+Local verification of Firebase ID tokens.
+Tokens are RS256 JWTs signed with Google's securetoken keys, so once the public certs are cached
+a check is a signature verification plus claim checks: no Admin SDK or REST round trip per request.
+Certs are fetched once, kept for the Cache-Control max-age of the response, and refreshed in the
+background shortly before they expire; an unknown `kid` (key rotation) forces a throttled refetch.
+A failing cert endpoint is retried at most once per MIN_FORCED_REFRESH_INTERVAL, while the last
+keys fetched keep being used.
+
+Claim checks follow Firebase's documented rules: alg RS256, known kid, aud = project id,
+iss = https://securetoken.google.com/<project id>, exp in the future (no leeway), iat and auth_time
+not in the future (CLOCK_SKEW seconds allowed), non-empty sub (the uid).
+"""
+import re
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import jwt
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+
+from services.executor import get_executor
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+DEFAULT_MAX_AGE = 3600
+REFRESH_BEFORE_EXPIRY = 300  # start a background refresh this many seconds before certs expire
+MIN_FORCED_REFRESH_INTERVAL = 60  # at most one unknown-kid refetch, or retry after a failure, per minute
+CLOCK_SKEW = 60
+
+
+class KeyFetchError(Exception):
+    """Google's public certs could not be fetched (verification can't be decided locally)."""
+
+
+def parse_max_age(cache_control: Optional[str]) -> int:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+def fetch_google_certs(session: Optional[requests.Session] = None) -> tuple[dict[str, str], int]:
+    """Download the securetoken certs. Returns ({kid: PEM certificate}, max-age seconds)."""
+    try:
+        response = (session or requests).get(GOOGLE_CERTS_URL, timeout=10)
+        response.raise_for_status()
+        return response.json(), parse_max_age(response.headers.get("Cache-Control"))
+    except (requests.RequestException, ValueError) as e:
+        raise KeyFetchError(f"Could not fetch Google public keys: {e}") from e
+
+
+class GooglePublicKeys:
+    """
+    Cached kid -> public key map, refreshed per Cache-Control.
+    Only the very first fetch (no keys at all) makes callers wait. Expiring or expired keys keep
+    being served while a single background refresh runs. After a failed fetch nothing is retried for
+    MIN_FORCED_REFRESH_INTERVAL seconds, so an outage of Google's cert endpoint costs at most one
+    fetch per interval instead of a blocking fetch per request.
+    """
+
+    def __init__(self, fetch: Optional[Callable[[], tuple[dict[str, str], int]]] = None):
+        self._session = requests.Session()
+        self._fetch = fetch or (lambda: fetch_google_certs(self._session))
+        self._keys: dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._last_failure = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()  # held while fetching
+        self._state_lock = threading.Lock()  # guards _refreshing; never held during a fetch
+        self.fetches = 0
+        self.failures = 0
+
+    def refresh(self) -> None:
+        """Fetch the certs now and replace the cached keys."""
+        with self._lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        try:
+            certs, max_age = self._fetch()
+        except KeyFetchError:
+            self._last_failure = time.time()
+            self.failures += 1
+            raise
+        self._keys = {
+            kid: load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+            for kid, pem in certs.items()
+        }
+        self._expires_at = time.time() + max_age
+        self._last_fetch = time.time()
+        self.fetches += 1
+
+    def _backing_off(self) -> bool:
+        return time.time() - self._last_failure < MIN_FORCED_REFRESH_INTERVAL
+
+    def _refresh_if(self, needed: Callable[[], bool]) -> None:
+        # Concurrent callers wait for one fetch instead of each fetching; a failure recorded by
+        # that fetch makes the waiters' re-check false, so they don't retry it
+        if needed() and not self._backing_off():
+            with self._lock:
+                if needed() and not self._backing_off():
+                    self._refresh_locked()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"WARNING: Background refresh of Google public keys failed: {e}")
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def _schedule_refresh(self) -> None:
+        """Submit one background refresh if the keys are (nearly) expired and none is running."""
+        if time.time() < self._expires_at - REFRESH_BEFORE_EXPIRY or self._backing_off():
+            return
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            get_executor("auth").submit(self._background_refresh)
+        except Exception:
+            with self._state_lock:
+                self._refreshing = False
+            raise
+
+    def warm(self) -> None:
+        """Fetch the certs if none are cached yet (call at startup)."""
+        try:
+            self._refresh_if(lambda: not self._keys)
+        except KeyFetchError as e:
+            print(f"WARNING: {e}")
+
+    def get(self, kid: str) -> Optional[Any]:
+        """Public key for `kid`, or None if Google doesn't publish it."""
+        if not self._keys:
+            # Never fetched: the caller has to wait for the fetch
+            self._refresh_if(lambda: not self._keys)
+            if not self._keys:
+                raise KeyFetchError("Google public keys are not available")
+        # Expiring or expired: keep serving the cached keys while one background refresh runs
+        self._schedule_refresh()
+
+        if kid not in self._keys:
+            self._refresh_if(lambda: kid not in self._keys
+                             and time.time() - self._last_fetch >= MIN_FORCED_REFRESH_INTERVAL)
+        return self._keys.get(kid)
+
+
+class FirebaseTokenVerifier:
+    def __init__(self, project_id: str, keys: Optional[GooglePublicKeys] = None):
+        self.project_id = project_id
+        self.keys = keys or GooglePublicKeys()
+
+    def verify(self, token: str) -> dict[str, Any]:
+        """
+        Return the decoded claims of a valid token (with "uid" set to "sub").
+        Raises jwt.ExpiredSignatureError for expired tokens, jwt.InvalidTokenError for any other
+        invalid token, and KeyFetchError if the public keys can't be fetched.
+        """
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != "RS256":
+            raise jwt.InvalidAlgorithmError("Firebase ID tokens must use RS256")
+        key = self.keys.get(header.get("kid", ""))
+        if key is None:
+            raise jwt.InvalidTokenError("Unknown key id")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=self.project_id,
+            issuer=f"https://securetoken.google.com/{self.project_id}",
+            # No leeway: like the Admin SDK, a token is rejected as soon as exp has passed.
+            # The clock skew allowance applies only to iat / auth_time (checked below).
+            options={"require": ["exp", "iat", "sub"], "verify_iat": False},
+        )
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise jwt.InvalidTokenError("Invalid sub claim")
+        iat = claims.get("iat")
+        if not isinstance(iat, (int, float)) or isinstance(iat, bool):
+            raise jwt.InvalidIssuedAtError("Issued At claim (iat) must be a number")
+        if iat > time.time() + CLOCK_SKEW:
+            raise jwt.ImmatureSignatureError("iat is in the future")
+        if claims.get("auth_time", 0) > time.time() + CLOCK_SKEW:
+            raise jwt.ImmatureSignatureError("auth_time is in the future")
+        claims["uid"] = sub
+        return claims
@@ -0,0 +1,83 @@
+"""
+HTTP caching for static files served by the API (recipe images and their resized variants).
+Responses carry a strong ETag derived from the file's SHA-256, Last-Modified, and a long-lived
+`Cache-Control: public, max-age=..., immutable` (or `public, no-cache` for URLs whose content can
+change, which then always revalidate). Conditional requests are answered with 304
+(If-None-Match first, else If-Modified-Since, per RFC 9110). Range / If-Range requests are
+handled by Starlette's FileResponse, which compares If-Range against the same ETag.
+
+Configure the lifetime with IMAGE_CACHE_MAX_AGE (seconds, default one year).
+"""
+import hashlib
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", 31536000))
+
+_digests: dict[tuple, str] = {}
+_digest_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's content, memoized by (path, size, mtime) so each version is read once."""
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        with _digest_lock:
+            _digests[memo_key] = digest
+    return digest
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag ("*" matches anything)."""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """True if the client's cached copy is current and a 304 should be sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins; If-Modified-Since is then ignored
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def cached_file_response(request: Request, path: str, media_type: str,
+                         max_age: Optional[int] = None, immutable: bool = True) -> Response:
+    """
+    FileResponse with ETag / Last-Modified / Cache-Control, or a 304 if the client is current.
+    immutable=False is for URLs that can point at different content later: clients cache the file
+    but revalidate it (a cheap 304) on every use. Raises FileNotFoundError if the file is gone.
+    """
+    etag = f'"{file_sha256(path)[:32]}"'
+    mtime = os.stat(path).st_mtime
+    if immutable:
+        cache_control = f"public, max-age={IMAGE_CACHE_MAX_AGE if max_age is None else max_age}, immutable"
+    else:
+        cache_control = "public, no-cache"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if request.method in ("GET", "HEAD") and not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
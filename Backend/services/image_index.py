@@ -0,0 +1,105 @@
+"""
+In-memory index of recipe image files, so resolving an image name is a dict lookup instead of an
+os.listdir scan of ~13.5k files on every case mismatch or miss.
+The index maps exact and lowercased file names to the real name. It is built on first use and
+rebuilt when the images directory's mtime changes (files added, removed or renamed), checked at
+most every IMAGE_INDEX_CHECK_INTERVAL seconds, or on demand with refresh().
+
+Ingestion also stores each recipe's resolved file in recipe_images (rebuild_recipe_images), so
+serving an image by recipe id needs no name resolution at all.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Files must be named {image_name}.jpg to match CSV Image_Name
+IMAGES_DIR = os.path.join(BACKEND_DIR, "images")
+IMAGE_INDEX_CHECK_INTERVAL = float(os.getenv("IMAGE_INDEX_CHECK_INTERVAL", 2))
+
+
+def image_file_name(image_name: Optional[str]) -> Optional[str]:
+    """Expected file name for an image_name (adds .jpg). None if empty or a path traversal attempt."""
+    image_name = (image_name or "").strip()
+    if not image_name or ".." in image_name or "/" in image_name or "\\" in image_name:
+        return None
+    return image_name if image_name.lower().endswith(".jpg") else f"{image_name}.jpg"
+
+
+class ImageIndex:
+    def __init__(self, images_dir: str = IMAGES_DIR, check_interval: float = IMAGE_INDEX_CHECK_INTERVAL):
+        self.images_dir = images_dir
+        self.check_interval = check_interval
+        self._names: set[str] = set()
+        self._by_lower: dict[str, str] = {}
+        self._dir_mtime: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def refresh(self) -> int:
+        """Rescan the images directory. Returns the number of files indexed."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.images_dir).st_mtime_ns
+                with os.scandir(self.images_dir) as entries:
+                    names = {entry.name for entry in entries if entry.is_file()}
+            except FileNotFoundError:
+                mtime, names = None, set()
+            by_lower: dict[str, str] = {}
+            for name in sorted(names):
+                by_lower.setdefault(name.lower(), name)
+            self._names, self._by_lower = names, by_lower
+            self._dir_mtime = mtime
+            self._checked_at = time.monotonic()
+            self.refreshes += 1
+            return len(names)
+
+    def _check_for_changes(self) -> None:
+        now = time.monotonic()
+        if self.refreshes and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.images_dir).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if not self.refreshes or mtime != self._dir_mtime:
+            self.refresh()
+
+    def resolve_name(self, image_name: Optional[str]) -> Optional[str]:
+        """Real file name for image_name: exact match, then case-insensitive. None if not found."""
+        base = image_file_name(image_name)
+        if base is None:
+            return None
+        self._check_for_changes()
+        if base in self._names:
+            return base
+        return self._by_lower.get(base.lower())
+
+    def resolve(self, image_name: Optional[str]) -> Optional[str]:
+        """Full path for image_name, or None if not found."""
+        name = self.resolve_name(image_name)
+        return os.path.join(self.images_dir, name) if name else None
+
+    def path(self, file_name: str) -> str:
+        return os.path.join(self.images_dir, file_name)
+
+    def stats(self) -> dict[str, Any]:
+        return {"files": len(self._names), "refreshes": self.refreshes}
+
+
+image_index = ImageIndex()
+
+
+def rebuild_recipe_images(conn: sqlite3.Connection, index: ImageIndex = image_index) -> int:
+    """Store every recipe's resolved image file in recipe_images and commit. Returns recipes with an image."""
+    index.refresh()
+    conn.execute("DELETE FROM recipe_images")
+    rows = conn.execute("SELECT id, image_name FROM recipes").fetchall()
+    pairs = [(row[0], name) for row in rows if (name := index.resolve_name(row[1]))]
+    conn.executemany("INSERT INTO recipe_images (recipe_id, file_name) VALUES (?, ?)", pairs)
+    conn.commit()
+    return len(pairs)
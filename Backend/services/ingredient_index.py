@@ -0,0 +1,282 @@
+"""
+Ingredient inverted index and "what can I cook with these" queries.
+Ingestion parses each recipe's cleaned_ingredients blob into normalized ingredient names stored in
+the ingredients / recipe_ingredients tables. At query time the postings are held in memory as sorted
+arrays of recipe positions, so bounding every recipe's pantry coverage is one concatenate and one
+bincount; only the recipes whose bound can still reach the top results get an exact item-to-ingredient
+matching. The postings are reloaded when recipe_ingredients changes (its data_versions counter), so
+the API sees rebuilds and syncs made by the scripts.
+"""
+import ast
+import bisect
+import re
+import sqlite3
+import threading
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from database.connection import get_data_version
+from database.pool import ConnectionPool
+from database.queries import get_recipe_summaries
+
+# Words dropped when normalizing an ingredient line: units, sizes and preparation notes
+_STOPWORDS = {
+    "a", "an", "and", "or", "of", "to", "for", "about", "plus", "more", "into", "in", "with", "from",
+    "cup", "cups", "tbsp", "tablespoon", "tablespoons", "tsp", "teaspoon", "teaspoons",
+    "lb", "lbs", "pound", "pounds", "oz", "ounce", "ounces", "g", "kg", "gram", "grams",
+    "ml", "l", "liter", "liters", "quart", "quarts", "pint", "pints", "gallon",
+    "pinch", "dash", "clove", "cloves", "can", "cans", "jar", "package", "packages", "stick", "sticks",
+    "bunch", "sprig", "sprigs", "slice", "slices", "piece", "pieces", "head", "heads", "inch",
+    "large", "medium", "small", "whole", "fresh", "freshly", "finely", "coarsely", "thinly", "roughly",
+    "chopped", "minced", "diced", "sliced", "grated", "ground", "crushed", "peeled", "divided",
+    "softened", "melted", "room", "temperature", "packed", "optional", "trimmed", "halved",
+    "quartered", "cut", "torn", "drained", "rinsed", "beaten", "cubed", "shredded", "toasted",
+}
+_UNICODE_FRACTIONS = "¼½¾⅓⅔⅛⅜⅝⅞"
+# Part nouns: 'chicken thigh' and 'lemon juice' are headed by the food they come from
+_PART_WORDS = {
+    "breast", "thigh", "drumstick", "wing", "leg", "fillet", "filet", "loin", "tenderloin", "chop",
+    "shank", "rib", "juice", "zest", "peel", "rind", "yolk", "white", "leaf", "floret", "kernel",
+}
+
+
+def parse_ingredient_lines(text: Optional[str]) -> list[str]:
+    """Split a cleaned_ingredients blob (a Python list literal in the CSV) into lines."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        try:
+            value = ast.literal_eval(text)
+            if isinstance(value, (list, tuple)):
+                return [str(item) for item in value if str(item).strip()]
+        except (ValueError, SyntaxError):
+            pass
+    return [part for part in re.split(r"\n|,\s*(?=\d)", text) if part.strip()]
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_words(text: str) -> list[str]:
+    """Lowercase, strip quantities/units/preparation words and singularize."""
+    text = text.lower()
+    text = re.sub(r"\([^)]*\)", " ", text)
+    text = re.sub(rf"[\d{_UNICODE_FRACTIONS}/.\-–]+", " ", text)
+    words = re.findall(r"[a-zà-ÿ]+", text)
+    return [_singular(w) for w in words if w not in _STOPWORDS]
+
+
+def normalize_ingredient(line: str) -> str:
+    """Canonical ingredient name for a recipe line, e.g. '2 cups chopped carrots, peeled' -> 'carrot'."""
+    main = line.split(",", 1)[0]
+    return " ".join(normalize_words(main))
+
+
+def head_noun(words: list[str]) -> Optional[str]:
+    """Last word of a normalized name, skipping trailing part nouns ('chicken thigh' -> 'chicken')."""
+    for word in reversed(words):
+        if word not in _PART_WORDS:
+            return word
+    return words[-1] if words else None
+
+
+def index_recipe_ingredients(conn: sqlite3.Connection, recipes: Iterable[dict[str, Any]]) -> int:
+    """
+    (Re)write recipe_ingredients rows for the given recipes. Caller commits.
+    Returns the number of (recipe, ingredient) pairs written.
+    """
+    ingredient_ids = {row["name"]: row["id"] for row in conn.execute("SELECT id, name FROM ingredients")}
+    pairs = []
+    recipe_ids = []
+    for recipe in recipes:
+        recipe_ids.append((recipe["id"],))
+        text = recipe.get("cleaned_ingredients") or recipe.get("ingredients")
+        names = {normalize_ingredient(line) for line in parse_ingredient_lines(text)}
+        for name in names:
+            if not name:
+                continue
+            if name not in ingredient_ids:
+                cursor = conn.execute("INSERT INTO ingredients (name) VALUES (?)", (name,))
+                ingredient_ids[name] = cursor.lastrowid
+            pairs.append((recipe["id"], ingredient_ids[name]))
+    conn.executemany("DELETE FROM recipe_ingredients WHERE recipe_id = ?", recipe_ids)
+    conn.executemany("INSERT OR IGNORE INTO recipe_ingredients (recipe_id, ingredient_id) VALUES (?, ?)", pairs)
+    return len(pairs)
+
+
+def rebuild_ingredient_index(conn: sqlite3.Connection) -> int:
+    """Rebuild the whole ingredient index from the recipes table and commit."""
+    conn.execute("DELETE FROM recipe_ingredients")
+    recipes = conn.execute("SELECT id, ingredients, cleaned_ingredients FROM recipes").fetchall()
+    count = index_recipe_ingredients(conn, (dict(row) for row in recipes))
+    conn.execute("DELETE FROM ingredients WHERE id NOT IN (SELECT ingredient_id FROM recipe_ingredients)")
+    conn.commit()
+    return count
+
+
+class PantryIndex:
+    """In-memory postings: ingredient id -> sorted recipe positions, plus a word -> ingredients map."""
+
+    def __init__(self, recipe_ids: np.ndarray, totals: np.ndarray, postings: dict[int, np.ndarray],
+                 names: dict[int, str]):
+        self.recipe_ids = recipe_ids
+        self.totals = totals
+        self.postings = postings
+        self.by_name = {name: ingredient_id for ingredient_id, name in names.items()}
+        self.words = {ingredient_id: name.split() for ingredient_id, name in names.items()}
+        self.by_head: dict[str, set[int]] = {}
+        for ingredient_id, words in self.words.items():
+            head = head_noun(words)
+            if head:
+                self.by_head.setdefault(head, set()).add(ingredient_id)
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection) -> "PantryIndex":
+        rows = conn.execute(
+            "SELECT ingredient_id, recipe_id FROM recipe_ingredients ORDER BY ingredient_id, recipe_id"
+        ).fetchall()
+        pairs = np.array([(row[0], row[1]) for row in rows], dtype=np.int64).reshape(-1, 2)
+        recipe_ids, positions = np.unique(pairs[:, 1], return_inverse=True)
+        totals = np.bincount(positions, minlength=len(recipe_ids))
+        postings: dict[int, np.ndarray] = {}
+        if len(pairs):
+            # Rows are grouped by ingredient_id; split positions at each group boundary
+            boundaries = np.flatnonzero(np.diff(pairs[:, 0])) + 1
+            for group in np.split(np.arange(len(pairs)), boundaries):
+                postings[int(pairs[group[0], 0])] = np.sort(positions[group])
+        names = {row["id"]: row["name"] for row in conn.execute("SELECT id, name FROM ingredients")}
+        return cls(recipe_ids, totals, postings, names)
+
+    def resolve(self, item: str) -> set[int]:
+        """
+        Ingredient ids a pantry item stands for: the exact normalized name, plus names with the same
+        head noun that only add descriptors ('salt' -> 'kosher salt', 'chicken' -> 'chicken thigh').
+        A modifier that is itself an ingredient makes a different food, so 'butter' does not match
+        'peanut butter' and 'chicken' does not match 'chicken broth' (headed by 'broth').
+        This depends on the corpus: 'peanut butter' only stays separate while some recipe lists 'peanut'
+        as an ingredient of its own; otherwise 'peanut' reads as a descriptor, like 'kosher'.
+        """
+        words = normalize_words(item)
+        if not words:
+            return set()
+        matches = set()
+        exact = self.by_name.get(" ".join(words))
+        if exact is not None:
+            matches.add(exact)
+        item_words = set(words)
+        for ingredient_id in self.by_head.get(head_noun(words), ()):
+            ingredient_words = set(self.words[ingredient_id])
+            extra = ingredient_words - item_words - _PART_WORDS
+            if item_words <= ingredient_words and not any(word in self.by_name for word in extra):
+                matches.add(ingredient_id)
+        return matches
+
+    def _has(self, ingredient_id: int, position: int) -> bool:
+        postings = self.postings[ingredient_id]
+        i = int(np.searchsorted(postings, position))
+        return i < len(postings) and postings[i] == position
+
+    def matched_count(self, position: int, item_ids: list[set[int]]) -> int:
+        """
+        Ingredients of one recipe covered by the pantry when each item covers at most one ingredient and
+        each ingredient is covered once: a maximum bipartite matching (augmenting paths; pantries are small).
+        """
+        edges = [[i for i in ids if self._has(i, position)] for ids in item_ids]
+        owner: dict[int, int] = {}
+
+        def augment(item: int, seen: set[int]) -> bool:
+            for ingredient_id in edges[item]:
+                if ingredient_id not in seen:
+                    seen.add(ingredient_id)
+                    if ingredient_id not in owner or augment(owner[ingredient_id], seen):
+                        owner[ingredient_id] = item
+                        return True
+            return False
+
+        return sum(augment(item, set()) for item in range(len(edges)))
+
+    def rank(self, pantry: list[str], limit: int = 20, max_missing: Optional[int] = None) -> list[dict[str, Any]]:
+        """
+        Rank recipes by the fraction of their ingredients covered by the pantry, then fewest missing.
+        Each pantry item covers at most one ingredient of a recipe, and each ingredient is covered once.
+        min(items hitting the recipe, distinct ingredients hit) bounds that count from above for every
+        recipe at once; recipes are visited best bound first and get the exact count (matched_count)
+        until no remaining bound can beat the limit-th result.
+        """
+        item_ids, item_lists, ingredient_ids = [], [], set()
+        for item in pantry:
+            ids = self.resolve(item) & self.postings.keys()
+            if ids:
+                # Recipes this item covers, once each even if several of its ingredients match
+                item_lists.append(np.unique(np.concatenate([self.postings[i] for i in ids])))
+                item_ids.append(ids)
+                ingredient_ids |= ids
+        if not item_lists or limit <= 0:
+            return []
+        size = len(self.recipe_ids)
+        item_hits = np.bincount(np.concatenate(item_lists), minlength=size)
+        ingredient_hits = np.bincount(np.concatenate([self.postings[i] for i in ingredient_ids]), minlength=size)
+        upper_bound = np.minimum(item_hits, ingredient_hits)
+        candidates = np.flatnonzero(upper_bound)
+        if max_missing is not None:
+            candidates = candidates[self.totals[candidates] - upper_bound[candidates] <= max_missing]
+        bound_coverage = upper_bound[candidates] / self.totals[candidates]
+        # lexsort: last key is primary -> coverage desc, then missing asc (ties keep recipe order)
+        order = np.lexsort((self.totals[candidates] - upper_bound[candidates], -bound_coverage))
+
+        # Sorted (-coverage, missing, position, matched), best first
+        top: list[tuple[float, int, int, int]] = []
+        for i in order:
+            position = int(candidates[i])
+            total = int(self.totals[position])
+            bound = int(upper_bound[position])
+            if len(top) >= limit and (-bound / total, total - bound) > top[limit - 1][:2]:
+                break  # the exact count can only be lower, and so can every later bound
+            matched = bound if bound == 1 else self.matched_count(position, item_ids)
+            if matched == 0 or (max_missing is not None and total - matched > max_missing):
+                continue
+            bisect.insort(top, (-matched / total, total - matched, position, matched))
+            del top[limit:]
+        return [
+            {
+                "id": int(self.recipe_ids[position]),
+                "coverage": -negative_coverage,
+                "matched": matched,
+                "missing": missing,
+                "total": int(self.totals[position]),
+            }
+            for negative_coverage, missing, position, matched in top
+        ]
+
+
+_index: Optional[PantryIndex] = None
+_index_version: Optional[tuple] = None
+_index_lock = threading.Lock()
+
+
+def get_pantry_index(conn: sqlite3.Connection) -> PantryIndex:
+    """Return the process-wide pantry index, (re)loading it when recipe_ingredients has changed."""
+    global _index, _index_version
+    version = get_data_version(conn, "recipe_ingredients")
+    if _index is None or version != _index_version:
+        with _index_lock:
+            if _index is None or version != _index_version:
+                _index, _index_version = PantryIndex.from_db(conn), version
+    return _index
+
+
+def recipes_for_pantry(db: ConnectionPool, pantry: list[str], limit: int = 20,
+                       max_missing: Optional[int] = None) -> list[dict[str, Any]]:
+    """Ranked pantry matches joined with recipe summaries (id, title, image_name)."""
+    matches = get_pantry_index(db.connection()).rank(pantry, limit, max_missing)
+    summaries = get_recipe_summaries(db, [m["id"] for m in matches])
+    return [{**summaries[m["id"]], **m} for m in matches if m["id"] in summaries]
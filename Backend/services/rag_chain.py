@@ -2,27 +2,35 @@
 RAG chain using recipe context and optional Tavily fallback when recipe doesn't contain the answer.
 Uses LangChain with Google Gemini.
 """
+import json
 import os
-from typing import Any
+import re
+import threading
+from typing import Any, Callable, Iterator, Optional
 
+import numpy as np
 from dotenv import load_dotenv
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
 
-from services.vector_store import build_recipe_vector_store
-from services.tavily_search import search_tavily, format_tavily_results
+from services.clients import get_llm
+from services.answer_cache import answer_cache_key, get_answer_cache
+from services.semantic_cache import get_semantic_cache
+from services.vector_store import build_recipe_vector_store, recipe_to_chunks
+from services.tavily_search import format_tavily_results
+from services import web_prefetch
 
 load_dotenv()
 
-# Lazy imports for LangChain/Google
+# "two_step": RAG answer, then a separate YES/NO sufficiency call (default).
+# "single": one call returning the answer with a supported flag and confidence.
+RAG_MODE = os.getenv("RAG_MODE", "two_step")
+# In single mode, answers below this confidence go to the web search fallback
+RAG_CONFIDENCE_THRESHOLD = float(os.getenv("RAG_CONFIDENCE_THRESHOLD", 0.5))
+
 def _get_llm():
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        return None
-    return ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash-lite",
-        google_api_key=api_key,
-        temperature=0.2,
-    )
+    """Shared chat model from the client registry (None if GOOGLE_API_KEY is missing)."""
+    return get_llm()
 
 
 RAG_SYSTEM = """You are a helpful assistant answering questions about a recipe. Use ONLY the recipe context below to answer. If the recipe does not contain enough information to answer the question, say clearly: "The recipe does not contain this information." Do not make up details."""
@@ -42,6 +50,15 @@ Answer: {answer}
 
 Does the recipe context alone fully support this answer? Could the user have gotten this answer only from the recipe? Reply with exactly one word: YES or NO."""
 
+RAG_STRUCTURED_USER_TEMPLATE = """Recipe context:
+{context}
+
+User question: {question}
+
+Answer based only on the recipe context above. Then judge whether the recipe context alone fully supports your answer.
+Respond with only a JSON object, no other text:
+{{"answer": "<your answer>", "supported": true or false, "confidence": <number from 0 to 1>}}"""
+
 TAVILY_SYSTEM = """You are a helpful assistant. The user asked a question about a recipe. The recipe context alone was not enough. Use the web search results below (and optionally the recipe context) to give a helpful, accurate answer. Cite sources when relevant."""
 
 TAVILY_USER_TEMPLATE = """Recipe context (may be partial):
@@ -54,32 +71,71 @@ User question: {question}
 
 Provide a comprehensive answer using the web search results above."""
 
+# Prompts are built once; chains are composed once per LLM instance and reused across requests
+PROMPTS = {
+    "rag": ChatPromptTemplate.from_messages([
+        ("system", RAG_SYSTEM),
+        ("human", RAG_USER_TEMPLATE),
+    ]),
+    "rag_structured": ChatPromptTemplate.from_messages([
+        ("system", RAG_SYSTEM),
+        ("human", RAG_STRUCTURED_USER_TEMPLATE),
+    ]),
+    "sufficiency": ChatPromptTemplate.from_messages([("human", SUFFICIENCY_TEMPLATE)]),
+    "web": ChatPromptTemplate.from_messages([
+        ("system", TAVILY_SYSTEM),
+        ("human", TAVILY_USER_TEMPLATE),
+    ]),
+}
+
+_chains: dict[tuple[str, int], Any] = {}
+_chains_lock = threading.Lock()
+# Bound on cached chains; only exceeded when LLM instances are swapped (tests, harnesses)
+_MAX_CACHED_CHAINS = 32
+
+
+def _get_chain(name: str, llm):
+    """
+    Return `PROMPTS[name] | llm | StrOutputParser()`, composed once per (prompt, llm) and cached.
+    The cached chain references llm, so its id() can't be reused while the entry exists.
+    """
+    key = (name, id(llm))
+    chain = _chains.get(key)
+    if chain is None:
+        with _chains_lock:
+            chain = _chains.get(key)
+            if chain is None:
+                if len(_chains) >= _MAX_CACHED_CHAINS:
+                    _chains.clear()
+                chain = PROMPTS[name] | llm | StrOutputParser()
+                _chains[key] = chain
+    return chain
 
-def _run_rag(recipe: dict[str, Any], question: str) -> str:
-    """Run RAG only: retrieve recipe context and generate answer. Returns empty string if LLM/embeddings unavailable."""
-    llm = _get_llm()
-    if llm is None:
-        return ""
 
+def _retrieve_context(recipe: dict[str, Any], question: str, question_vector: Optional[np.ndarray] = None) -> str:
+    """
+    Recipe chunks relevant to the question, or the whole recipe when embeddings are unavailable.
+    question_vector is the question already embedded (by the semantic cache), to skip embedding it again.
+    """
     vector_store = build_recipe_vector_store(recipe)
     if vector_store is None:
         # No embeddings: use full recipe text as context
-        from services.vector_store import recipe_to_chunks
-        context = "\n\n".join(recipe_to_chunks(recipe))
+        return "\n\n".join(recipe_to_chunks(recipe))
+    if question_vector is not None:
+        docs = vector_store.similarity_search_by_vector(question_vector.tolist(), k=5)
     else:
-        retriever = vector_store.as_retriever(search_kwargs={"k": 5})
-        docs = retriever.invoke(question)
-        context = "\n\n".join(doc.page_content for doc in docs)
+        docs = vector_store.as_retriever(search_kwargs={"k": 5}).invoke(question)
+    return "\n\n".join(doc.page_content for doc in docs)
 
-    from langchain_core.prompts import ChatPromptTemplate
-    from langchain_core.output_parsers import StrOutputParser
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", RAG_SYSTEM),
-        ("human", RAG_USER_TEMPLATE),
-    ])
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({"context": context, "question": question})
+def _run_rag(recipe: dict[str, Any], question: str, question_vector: Optional[np.ndarray] = None) -> str:
+    """Run RAG only: retrieve recipe context and generate answer. Returns empty string if LLM/embeddings unavailable."""
+    llm = _get_llm()
+    if llm is None:
+        return ""
+
+    context = _retrieve_context(recipe, question, question_vector)
+    return _get_chain("rag", llm).invoke({"context": context, "question": question})
 
 
 def _answer_sufficient(question: str, answer: str) -> bool:
@@ -87,68 +143,222 @@ def _answer_sufficient(question: str, answer: str) -> bool:
     llm = _get_llm()
     if llm is None:
         return True  # avoid Tavily if no LLM
-    from langchain_core.prompts import ChatPromptTemplate
-    from langchain_core.output_parsers import StrOutputParser
-    prompt = ChatPromptTemplate.from_messages([("human", SUFFICIENCY_TEMPLATE)])
-    chain = prompt | llm | StrOutputParser()
-    reply = chain.invoke({"question": question, "answer": answer}).strip().upper()
+    reply = _get_chain("sufficiency", llm).invoke({"question": question, "answer": answer}).strip().upper()
     return reply.startswith("YES")
 
 
+def parse_rag_verdict(raw: str) -> Optional[dict[str, Any]]:
+    """Parse the single-call JSON reply into {answer, supported, confidence}. Returns None if malformed."""
+    match = re.search(r"\{.*\}", raw, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("answer"), str):
+        return None
+    try:
+        confidence = min(max(float(data.get("confidence", 1.0)), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return None
+    return {"answer": data["answer"], "supported": bool(data.get("supported")), "confidence": confidence}
+
+
+def _run_rag_structured(recipe: dict[str, Any], question: str, question_vector: Optional[np.ndarray] = None) -> str:
+    """Single-call RAG: raw model reply containing the answer and its verdict. Empty string if no LLM."""
+    llm = _get_llm()
+    if llm is None:
+        return ""
+
+    context = _retrieve_context(recipe, question, question_vector)
+    return _get_chain("rag_structured", llm).invoke({"context": context, "question": question})
+
+
+def _rag_with_verdict(recipe: dict[str, Any], question: str,
+                      question_vector: Optional[np.ndarray] = None) -> tuple[str, bool]:
+    """
+    RAG answer and whether the recipe alone supports it. Uses one LLM call when RAG_MODE=single
+    (falling back to the separate check if the reply isn't valid JSON), two calls otherwise.
+    Returns ("", True) when the LLM is unavailable.
+    """
+    if RAG_MODE == "single":
+        raw = _run_rag_structured(recipe, question, question_vector)
+        if not raw:
+            return "", True
+        verdict = parse_rag_verdict(raw)
+        if verdict is not None:
+            return verdict["answer"], verdict["supported"] and verdict["confidence"] >= RAG_CONFIDENCE_THRESHOLD
+        answer = raw
+    else:
+        answer = _run_rag(recipe, question, question_vector)
+        if not answer:
+            return "", True
+    return answer, _answer_sufficient(question, answer)
+
+
+def _web_inputs(recipe: dict[str, Any], question: str, web_results: list[dict[str, Any]]) -> dict[str, str]:
+    """Inputs for the "web" chain: full recipe text, formatted search results and the question."""
+    return {
+        "recipe_context": "\n\n".join(recipe_to_chunks(recipe)),
+        "web_results": format_tavily_results(web_results),
+        "question": question,
+    }
+
+
+NO_WEB_RESULTS_NOTE = "\n\n(I looked for more information online but couldn't find additional results.)"
+
+NOT_CONFIGURED_MESSAGE = "I couldn't process your question. Please ensure the recipe and API keys (Google, optionally Tavily) are configured."
+
+
 def answer_with_rag_or_tavily(recipe: dict[str, Any], user_message: str) -> str:
     """
     Answer the user's question using recipe context (RAG). If the recipe doesn't contain
     the answer, use Tavily to search the web and generate a comprehensive answer.
+    Answers are cached per recipe content and normalized question (see services/answer_cache.py),
+    and paraphrased questions reuse earlier answers (see services/semantic_cache.py).
+    """
+    cached, remember, question_vector = _lookup_cached_answer(recipe, user_message)
+    if cached is not None:
+        return cached
+    answer, cacheable = _answer_uncached(recipe, user_message, question_vector)
+    if cacheable:
+        remember(answer)
+    return answer
+
+
+def _lookup_cached_answer(
+    recipe: dict[str, Any], user_message: str,
+) -> tuple[Optional[str], Callable[[str], None], Optional[np.ndarray]]:
+    """
+    Check the exact and semantic answer caches.
+    Returns (cached answer or None, remember, question vector) where remember(answer) stores a fresh
+    answer in both, and the question vector (if the semantic cache embedded the question with the
+    chat embedding model) can be reused for retrieval.
+    A semantic hit is not copied into the exact cache, so it expires with the answer it came from.
     """
-    # 1. Run RAG with recipe context
-    rag_answer = _run_rag(recipe, user_message)
+    cache = get_answer_cache()
+    key = answer_cache_key(recipe, user_message) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, lambda answer: None, None
+
+    semantic = get_semantic_cache()
+    question_vector = semantic.embed(user_message) if semantic else None
+    if question_vector is not None:
+        similar = semantic.lookup(recipe, question_vector)
+        if similar is not None:
+            return similar, lambda answer: None, None
+
+    def remember(answer: str) -> None:
+        if cache:
+            cache.set(key, answer)
+        if question_vector is not None:
+            semantic.add(recipe, question_vector, answer)
+
+    # A cache built with its own embeddings (tests) embeds in a different space than retrieval
+    retrieval_vector = question_vector if semantic is not None and semantic.embeddings is None else None
+    return None, remember, retrieval_vector
+
+
+def stream_with_rag_or_tavily(recipe: dict[str, Any], user_message: str) -> Iterator[dict[str, Any]]:
+    """
+    Streaming variant of answer_with_rag_or_tavily. Yields events as they happen:
+      {"type": "phase", "phase": "cache" | "rag" | "checking" | "web_search" | "web_answer"}
+      {"type": "token", "text": "..."}
+      {"type": "done", "response": "<final answer>"}
+    A "web_answer" phase means the recipe answer was insufficient: clients should discard the
+    tokens streamed so far and render the web-backed answer that follows.
+    Always uses the two-step check: a single-call JSON reply can't be streamed as answer tokens.
+    """
+    cached, remember, question_vector = _lookup_cached_answer(recipe, user_message)
+    if cached is not None:
+        yield {"type": "phase", "phase": "cache"}
+        yield {"type": "token", "text": cached}
+        yield {"type": "done", "response": cached}
+        return
+
+    llm = _get_llm()
+    if llm is None:
+        # Nothing to stream without an LLM; fall back to the blocking path
+        answer, cacheable = _answer_uncached(recipe, user_message, question_vector)
+        if cacheable:
+            remember(answer)
+        yield {"type": "token", "text": answer}
+        yield {"type": "done", "response": answer}
+        return
+
+    # 1. Stream the RAG answer (with a speculative web search for web-bound questions)
+    prefetch = web_prefetch.start_prefetch(user_message)
+    yield {"type": "phase", "phase": "rag"}
+    context = _retrieve_context(recipe, user_message, question_vector)
+    parts = []
+    for token in _get_chain("rag", llm).stream({"context": context, "question": user_message}):
+        parts.append(token)
+        yield {"type": "token", "text": token}
+    answer = "".join(parts)
+
+    # 2. Check if answer is fully supported by recipe
+    cacheable = True
+    yield {"type": "phase", "phase": "checking"}
+    if _answer_sufficient(user_message, answer):
+        web_prefetch.discard(prefetch)
+    else:
+        # 3. Fallback to Tavily and stream an answer from web results
+        yield {"type": "phase", "phase": "web_search"}
+        web_results = web_prefetch.web_results(user_message, prefetch)
+        if not web_results:
+            # Search failed or found nothing: don't cache, so the next ask tries the web again
+            cacheable = False
+            answer += NO_WEB_RESULTS_NOTE
+            yield {"type": "token", "text": NO_WEB_RESULTS_NOTE}
+        else:
+            yield {"type": "phase", "phase": "web_answer"}
+            parts = []
+            for token in _get_chain("web", llm).stream(_web_inputs(recipe, user_message, web_results)):
+                parts.append(token)
+                yield {"type": "token", "text": token}
+            answer = "".join(parts)
+
+    if cacheable:
+        remember(answer)
+    yield {"type": "done", "response": answer}
+
+
+def _answer_uncached(recipe: dict[str, Any], user_message: str,
+                     question_vector: Optional[np.ndarray] = None) -> tuple[str, bool]:
+    """
+    Run the RAG chain with Tavily fallback, without consulting the cache.
+    question_vector, when given, is the already embedded question used for retrieval.
+    Returns (answer, cacheable). Degraded answers (not configured, raw web results without an LLM,
+    or a needed web search that failed or found nothing) are not cacheable, so a later ask retries.
+    """
+    # 1. Run RAG with recipe context (and judge sufficiency, see RAG_MODE),
+    #    prefetching web results meanwhile when the question looks web-bound
+    prefetch = web_prefetch.start_prefetch(user_message)
+    rag_answer, sufficient = _rag_with_verdict(recipe, user_message, question_vector)
     if not rag_answer:
         # Fallback when GOOGLE_API_KEY missing or RAG failed: try Tavily only
-        web_results = search_tavily(user_message, max_results=5)
+        web_results = web_prefetch.web_results(user_message, prefetch)
         if not web_results:
-            return "I couldn't process your question. Please ensure the recipe and API keys (Google, optionally Tavily) are configured."
+            return NOT_CONFIGURED_MESSAGE, False
         llm = _get_llm()
         if llm is None:
-            return format_tavily_results(web_results)
-        from langchain_core.prompts import ChatPromptTemplate
-        from langchain_core.output_parsers import StrOutputParser
-        from services.vector_store import recipe_to_chunks
-        recipe_context = "\n\n".join(recipe_to_chunks(recipe))
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", TAVILY_SYSTEM),
-            ("human", TAVILY_USER_TEMPLATE),
-        ])
-        chain = prompt | llm | StrOutputParser()
-        return chain.invoke({
-            "recipe_context": recipe_context,
-            "web_results": format_tavily_results(web_results),
-            "question": user_message,
-        })
+            return format_tavily_results(web_results), False
+        return _get_chain("web", llm).invoke(_web_inputs(recipe, user_message, web_results)), True
 
-    # 2. Check if answer is fully supported by recipe
-    if _answer_sufficient(user_message, rag_answer):
-        return rag_answer
+    # 2. Return it if the answer is fully supported by recipe
+    if sufficient:
+        web_prefetch.discard(prefetch)
+        return rag_answer, True
 
     # 3. Fallback to Tavily and answer with web results
-    web_results = search_tavily(user_message, max_results=5)
+    web_results = web_prefetch.web_results(user_message, prefetch)
     if not web_results:
-        return rag_answer + "\n\n(I looked for more information online but couldn't find additional results.)"
+        return rag_answer + NO_WEB_RESULTS_NOTE, False
 
     llm = _get_llm()
     if llm is None:
-        return rag_answer
-
-    from langchain_core.prompts import ChatPromptTemplate
-    from langchain_core.output_parsers import StrOutputParser
-    from services.vector_store import recipe_to_chunks
-    recipe_context = "\n\n".join(recipe_to_chunks(recipe))
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", TAVILY_SYSTEM),
-        ("human", TAVILY_USER_TEMPLATE),
-    ])
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({
-        "recipe_context": recipe_context,
-        "web_results": format_tavily_results(web_results),
-        "question": user_message,
-    })
+        return rag_answer, False
+    return _get_chain("web", llm).invoke(_web_inputs(recipe, user_message, web_results)), True
@@ -0,0 +1,225 @@
+"""
+Incremental re-ingestion of the recipe CSV.
+Every recipe row carries a stable natural key (source_key: the CSV's index column, or image_name)
+and a hash of its content. A sync upserts on the key, so recipe ids survive reloads and favorites
+stay attached; unchanged rows are not written at all, and rows gone from the CSV are deleted along
+with their favorites and derived data.
+
+The result is a ChangeSet (added / updated / deleted ids and affected image names) that the
+derived indexes consume incrementally: FTS follows through its triggers, the ingredient index and
+recipe_images are refreshed here for the touched ids only, and embeddings / thumbnails can be
+brought up to date with the change set file written by scripts/populate_db.py --sync.
+"""
+import csv
+import hashlib
+import json
+import sqlite3
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+CONTENT_COLUMNS = ("title", "ingredients", "instructions", "image_name", "cleaned_ingredients")
+# CSV header for each recipe column
+CSV_COLUMNS = {
+    "title": "Title",
+    "ingredients": "Ingredients",
+    "instructions": "Instructions",
+    "image_name": "Image_Name",
+    "cleaned_ingredients": "Cleaned_Ingredients",
+}
+NATURAL_KEYS = ("index", "image_name")
+# meta row recording which natural key the loaded recipes use; a sync must use the same one
+KEY_META_NAME = "recipe_key"
+SYNC_BATCH_SIZE = 1000
+
+# Tables holding per-recipe derived data, cleared for deleted recipes
+DEPENDENT_TABLES = ("favorites", "recipe_ingredients", "recipe_images", "recipe_embeddings")
+
+
+def row_content_hash(values: Iterable[Optional[str]]) -> str:
+    """SHA-256 over the content columns (unit separator between fields, so shifts can't collide)."""
+    return hashlib.sha256("\x1f".join(v or "" for v in values).encode("utf-8")).hexdigest()
+
+
+def get_recipe_key(conn: sqlite3.Connection) -> Optional[str]:
+    """Natural key the recipes were loaded with, or None for a database loaded before it was recorded."""
+    row = conn.execute("SELECT value FROM meta WHERE name = ?", (KEY_META_NAME,)).fetchone()
+    return row[0] if row else None
+
+
+def set_recipe_key(conn: sqlite3.Connection, key: str) -> None:
+    """Record the natural key used for the load. Caller commits."""
+    conn.execute(
+        "INSERT INTO meta (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+        (KEY_META_NAME, key),
+    )
+
+
+def unique_keys() -> Callable[[str], str]:
+    """
+    Return a function that makes raw keys unique in the order they are seen: the first "a" stays "a",
+    the next ones become "a#2", "a#3"... and empty keys become "#1", "#2"... The same file always gets
+    the same keys, so a full load and a later sync of it agree on every row.
+    """
+    counts: dict[str, int] = {}
+    taken: set[str] = set()
+
+    def make_unique(raw: str) -> str:
+        n = counts.get(raw, 0) + 1
+        key = raw if n == 1 and raw else f"{raw}#{n}"
+        while key in taken:  # "a#2" may also appear in the file as a key of its own
+            n += 1
+            key = f"{raw}#{n}"
+        counts[raw] = n
+        taken.add(key)
+        return key
+
+    return make_unique
+
+
+def read_csv_recipes(csv_path: str, key: str = "index") -> Iterator[dict[str, Any]]:
+    """
+    Stream recipes from the CSV as dicts with the content columns plus source_key and content_hash.
+    key="index" uses the dump's first (unnamed) column; key="image_name" uses Image_Name.
+    Repeated and empty keys are made unique with a "#n" suffix (see unique_keys), so no row is dropped.
+    """
+    if key not in NATURAL_KEYS:
+        raise ValueError(f"Unknown natural key: {key}")
+    make_unique = unique_keys()
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        index_column = reader.fieldnames[0] if reader.fieldnames else ""
+        for row in reader:
+            recipe = {column: row.get(header) for column, header in CSV_COLUMNS.items()}
+            source_key = row.get(index_column) if key == "index" else recipe["image_name"]
+            recipe["source_key"] = make_unique((source_key or "").strip())
+            recipe["content_hash"] = row_content_hash(recipe[c] for c in CONTENT_COLUMNS)
+            yield recipe
+
+
+@dataclass
+class ChangeSet:
+    added: list[int] = field(default_factory=list)
+    updated: list[int] = field(default_factory=list)
+    deleted: list[int] = field(default_factory=list)
+    unchanged: int = 0
+    skipped: int = 0  # rows without a key, or repeating a key already seen (never from read_csv_recipes)
+    # Image names of added / updated recipes (variants to pre-generate)
+    images: list[str] = field(default_factory=list)
+
+    @property
+    def touched(self) -> list[int]:
+        return self.added + self.updated
+
+    def summary(self) -> str:
+        return (f"{len(self.added)} added, {len(self.updated)} updated, {len(self.deleted)} deleted, "
+                f"{self.unchanged} unchanged, {self.skipped} skipped")
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "ChangeSet":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+
+def _existing_rows(conn: sqlite3.Connection) -> tuple[dict[str, tuple[int, str]], dict[str, list[int]]]:
+    """
+    ({source_key: (id, content_hash)}, {image_name: [ids]} for rows loaded before keys existed).
+    Legacy ids are listed in id order; many rows can share an image_name (e.g. "#NAME?"). Rows
+    with neither a key nor an image_name are listed under "" and never matched.
+    """
+    keyed: dict[str, tuple[int, str]] = {}
+    legacy: dict[str, list[int]] = {}
+    for recipe_id, source_key, content_hash, image_name in conn.execute(
+        "SELECT id, source_key, content_hash, image_name FROM recipes ORDER BY id"
+    ):
+        if source_key is not None:
+            keyed[source_key] = (recipe_id, content_hash)
+        else:
+            legacy.setdefault(image_name or "", []).append(recipe_id)
+    return keyed, legacy
+
+
+def sync_recipes(conn: sqlite3.Connection, recipes: Iterable[dict[str, Any]],
+                 batch_size: int = SYNC_BATCH_SIZE) -> ChangeSet:
+    """
+    Upsert recipes on source_key and delete rows whose key is gone; commits once at the end.
+    Recipes loaded before keys existed are matched once by image_name, keeping their ids; rows sharing
+    an image_name are matched one by one in id order, and any left over are deleted.
+    """
+    keyed, legacy = _existing_rows(conn)
+    changes = ChangeSet()
+    seen: set[str] = set()
+    columns = (*CONTENT_COLUMNS, "source_key", "content_hash")
+    placeholders = ", ".join("?" for _ in columns)
+    assignments = ", ".join(f"{c} = ?" for c in columns)
+
+    recipes = iter(recipes)
+    while batch := list(islice(recipes, batch_size)):
+        inserts, updates = [], []
+        for recipe in batch:
+            key = recipe["source_key"]
+            if key is None or key in seen:
+                changes.skipped += 1
+                continue
+            seen.add(key)
+            values = tuple(recipe[c] for c in columns)
+            existing = keyed.get(key)
+            if existing is None and recipe["image_name"] and legacy.get(recipe["image_name"]):
+                existing = (legacy[recipe["image_name"]].pop(0), None)
+            if existing is None:
+                inserts.append(values)
+            elif existing[1] != recipe["content_hash"]:
+                updates.append((*values, existing[0]))
+                changes.updated.append(existing[0])
+                changes.images.append(recipe["image_name"])
+            else:
+                changes.unchanged += 1
+        for values in inserts:
+            # One row at a time so each new id can be recorded (lastrowid)
+            cursor = conn.execute(f"INSERT INTO recipes ({', '.join(columns)}) VALUES ({placeholders})", values)
+            changes.added.append(cursor.lastrowid)
+            changes.images.append(values[CONTENT_COLUMNS.index("image_name")])
+        conn.executemany(f"UPDATE recipes SET {assignments} WHERE id = ?", updates)
+
+    # Keys gone from the CSV, plus legacy rows left unmatched (duplicates of rows matched or inserted above)
+    gone = [recipe_id for key, (recipe_id, _) in keyed.items() if key not in seen]
+    gone += [recipe_id for ids in legacy.values() for recipe_id in ids]
+    for start in range(0, len(gone), batch_size):
+        ids = gone[start:start + batch_size]
+        id_placeholders = ", ".join("?" for _ in ids)
+        for table in DEPENDENT_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE recipe_id IN ({id_placeholders})", ids)
+        conn.execute(f"DELETE FROM recipes WHERE id IN ({id_placeholders})", ids)
+    changes.deleted = gone
+    changes.images = [name for name in changes.images if name]
+    conn.commit()
+    return changes
+
+
+def apply_to_derived_indexes(conn: sqlite3.Connection, changes: ChangeSet) -> None:
+    """Refresh the ingredient index and recipe_images for the touched recipes only, and commit."""
+    from services.image_index import image_index
+    from services.ingredient_index import index_recipe_ingredients
+
+    touched = changes.touched
+    image_index.refresh()
+    for start in range(0, len(touched), SYNC_BATCH_SIZE):
+        ids = touched[start:start + SYNC_BATCH_SIZE]
+        id_placeholders = ", ".join("?" for _ in ids)
+        rows = conn.execute(
+            f"SELECT id, ingredients, cleaned_ingredients, image_name FROM recipes WHERE id IN ({id_placeholders})", ids
+        ).fetchall()
+        index_recipe_ingredients(conn, (dict(row) for row in rows))
+
+        conn.execute(f"DELETE FROM recipe_images WHERE recipe_id IN ({id_placeholders})", ids)
+        conn.executemany(
+            "INSERT INTO recipe_images (recipe_id, file_name) VALUES (?, ?)",
+            [(row["id"], name) for row in rows if (name := image_index.resolve_name(row["image_name"]))],
+        )
+    if touched or changes.deleted:
+        conn.execute("DELETE FROM ingredients WHERE id NOT IN (SELECT ingredient_id FROM recipe_ingredients)")
+    conn.commit()
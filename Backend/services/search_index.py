@@ -0,0 +1,161 @@
+"""
+Cross-recipe semantic search over the precomputed chunk embeddings (services/embedding_index.py).
+All chunk vectors are loaded into one normalized float32 matrix, so a query is a single batched
+dot product. An optional IVF (inverted file) index clusters the chunks with k-means and only
+scores the `nprobe` closest clusters, trading a little recall for latency on large catalogs.
+
+Only vectors whose content hash matches the recipe's current chunk are loaded. The index is
+reloaded when the recipes or recipe_embeddings tables change (their data_versions counters),
+so a running server picks up populate_db / build_embeddings.py / --sync runs.
+"""
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+import numpy as np
+
+from database.connection import get_data_version
+from database.pool import ConnectionPool
+from database.queries import get_recipe_summaries
+from services.embedding_index import chunk_hash
+from services.vector_store import EMBEDDING_MODEL, recipe_to_chunks
+
+# "exact" (brute-force dot product) or "ivf" (approximate)
+SEARCH_INDEX_MODE = os.getenv("SEARCH_INDEX_MODE", "exact")
+IVF_LISTS = int(os.getenv("SEARCH_IVF_LISTS", 64))
+IVF_NPROBE = int(os.getenv("SEARCH_IVF_NPROBE", 8))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class RecipeSearchIndex:
+    """In-memory chunk-vector matrix with exact and IVF top-k search by recipe."""
+
+    def __init__(self, vectors: np.ndarray, recipe_ids: np.ndarray):
+        self.vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.recipe_ids)
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection) -> "RecipeSearchIndex":
+        """Load stored vectors that are current: their recipe exists and the chunk text hasn't changed."""
+        rows = conn.execute(
+            """
+            SELECT e.recipe_id, e.chunk_index, e.content_hash, e.vector,
+                   r.title, r.ingredients, r.cleaned_ingredients, r.instructions
+            FROM recipe_embeddings e JOIN recipes r ON r.id = e.recipe_id
+            WHERE e.model = ?
+            ORDER BY e.recipe_id, e.chunk_index
+            """,
+            (EMBEDDING_MODEL,),
+        ).fetchall()
+        current_hashes: dict[int, list[str]] = {}
+        vectors, recipe_ids = [], []
+        for row in rows:
+            hashes = current_hashes.get(row["recipe_id"])
+            if hashes is None:
+                hashes = current_hashes[row["recipe_id"]] = [chunk_hash(c) for c in recipe_to_chunks(dict(row))]
+            if row["chunk_index"] < len(hashes) and hashes[row["chunk_index"]] == row["content_hash"]:
+                vectors.append(np.frombuffer(row["vector"], dtype=np.float32))
+                recipe_ids.append(row["recipe_id"])
+        if not vectors:
+            return cls(np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64))
+        return cls(np.stack(vectors), np.array(recipe_ids))
+
+    def build_ivf(self, n_lists: int = IVF_LISTS, iterations: int = 10, seed: int = 0) -> None:
+        """Cluster chunk vectors with spherical k-means and build per-cluster posting lists."""
+        n = len(self)
+        if n == 0:
+            return
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, n_lists, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, self.vectors)
+            empty = np.bincount(assign, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        assign = np.argmax(self.vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assign == c) for c in range(n_lists)]
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        if self.centroids is None:
+            return None
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[c] for c in probe])
+
+    def search(self, query_vector, k: int = 10, nprobe: int = IVF_NPROBE) -> list[tuple[int, float]]:
+        """
+        Return up to k (recipe_id, score) pairs, best first. A recipe scores as its best chunk.
+        Uses the IVF lists when built, otherwise scores every chunk.
+        """
+        if len(self) == 0:
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        candidates = self._candidates(query, nprobe)
+        if candidates is None:
+            scores = self.vectors @ query
+            ids = self.recipe_ids
+        else:
+            scores = self.vectors[candidates] @ query
+            ids = self.recipe_ids[candidates]
+        if len(scores) == 0:
+            return []
+        # Over-fetch chunks so k distinct recipes survive de-duplication
+        top = min(len(scores), k * 4)
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        results: list[tuple[int, float]] = []
+        seen = set()
+        for i in best:
+            recipe_id = int(ids[i])
+            if recipe_id in seen:
+                continue
+            seen.add(recipe_id)
+            results.append((recipe_id, float(scores[i])))
+            if len(results) == k:
+                break
+        return results
+
+
+_index: Optional[RecipeSearchIndex] = None
+_index_version: Optional[tuple] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index(conn: sqlite3.Connection) -> RecipeSearchIndex:
+    """Return the process-wide index, (re)loading it when recipes or embeddings have changed."""
+    global _index, _index_version
+    version = get_data_version(conn, "recipes", "recipe_embeddings")
+    if _index is None or version != _index_version:
+        with _index_lock:
+            if _index is None or version != _index_version:
+                index = RecipeSearchIndex.from_db(conn)
+                if SEARCH_INDEX_MODE == "ivf":
+                    index.build_ivf()
+                _index, _index_version = index, version
+    return _index
+
+
+def search_recipes(db: ConnectionPool, query_vector, k: int = 10) -> list[dict]:
+    """Top-k recipe summaries (id, title, image_name, score) for an embedded query."""
+    hits = get_search_index(db.connection()).search(query_vector, k)
+    summaries = get_recipe_summaries(db, [recipe_id for recipe_id, _ in hits])
+    return [
+        {**summaries[recipe_id], "score": score}
+        for recipe_id, score in hits
+        if recipe_id in summaries
+    ]
@@ -0,0 +1,143 @@
+"""
+Semantic near-duplicate cache for chat answers.
+Questions are embedded and compared with earlier questions about the same recipe; when cosine
+similarity clears the threshold ("how long to bake" vs "baking time?") the stored answer is reused.
+Each recipe keeps a bounded matrix of question vectors, so a lookup is one dot product. Entries
+expire after ANSWER_CACHE_TTL, like the exact answer cache.
+
+Configure with SEMANTIC_CACHE (on | off), SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_PER_RECIPE
+and SEMANTIC_CACHE_MAX_RECIPES.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+from services.answer_cache import ANSWER_CACHE_TTL, recipe_content_hash
+from services.vector_store import _get_embeddings
+
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "on")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_PER_RECIPE = int(os.getenv("SEMANTIC_CACHE_PER_RECIPE", 50))
+SEMANTIC_CACHE_MAX_RECIPES = int(os.getenv("SEMANTIC_CACHE_MAX_RECIPES", 1000))
+
+
+class _RecipeQuestions:
+    """Fixed-capacity ring of normalized question vectors, their answers and when they were added, for one recipe."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.answers: list[Optional[str]] = [None] * capacity
+        self.added = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self.next = 0
+
+    def best(self, vector: np.ndarray, not_before: float) -> tuple[float, Optional[str]]:
+        """Most similar answer among the entries added at or after not_before."""
+        fresh = self.added[: self.size] >= not_before
+        if not fresh.any():
+            return 0.0, None
+        scores = np.where(fresh, self.vectors[: self.size] @ vector, -np.inf)
+        i = int(np.argmax(scores))
+        return float(scores[i]), self.answers[i]
+
+    def expired(self, not_before: float) -> bool:
+        return not (self.added[: self.size] >= not_before).any()
+
+    def add(self, vector: np.ndarray, answer: str, now: float) -> None:
+        self.vectors[self.next] = vector
+        self.answers[self.next] = answer
+        self.added[self.next] = now
+        self.next = (self.next + 1) % len(self.answers)
+        self.size = min(self.size + 1, len(self.answers))
+
+
+class SemanticAnswerCache:
+    """Per-recipe question-similarity cache, LRU-bounded by number of recipes; entries expire after ttl seconds."""
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, per_recipe: int = SEMANTIC_CACHE_PER_RECIPE,
+                 max_recipes: int = SEMANTIC_CACHE_MAX_RECIPES, embeddings=None, ttl: float = ANSWER_CACHE_TTL):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.per_recipe = per_recipe
+        self.max_recipes = max_recipes
+        self.embeddings = embeddings
+        self.hits = 0
+        self.misses = 0
+        self._recipes: OrderedDict[tuple, _RecipeQuestions] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, question: str) -> Optional[np.ndarray]:
+        """Normalized question vector, or None if embeddings are unavailable or fail."""
+        embeddings = self.embeddings or _get_embeddings()
+        if embeddings is None:
+            return None
+        try:
+            vector = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+        except Exception as e:
+            print(f"WARNING: Could not embed question for semantic cache: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    @staticmethod
+    def _key(recipe: dict[str, Any]) -> tuple:
+        return (recipe.get("id"), recipe_content_hash(recipe))
+
+    def lookup(self, recipe: dict[str, Any], vector: np.ndarray) -> Optional[str]:
+        """Return the answer of the most similar unexpired earlier question if it clears the threshold."""
+        key = self._key(recipe)
+        not_before = time.time() - self.ttl
+        with self._lock:
+            entries = self._recipes.get(key)
+            if entries is not None and entries.expired(not_before):
+                del self._recipes[key]
+                entries = None
+            score, answer = entries.best(vector, not_before) if entries else (0.0, None)
+            if answer is not None and score >= self.threshold:
+                self._recipes.move_to_end(key)
+                self.hits += 1
+                return answer
+            self.misses += 1
+            return None
+
+    def add(self, recipe: dict[str, Any], vector: np.ndarray, answer: str) -> None:
+        key = self._key(recipe)
+        with self._lock:
+            entries = self._recipes.get(key)
+            if entries is None or entries.vectors.shape[1] != len(vector):
+                entries = _RecipeQuestions(len(vector), self.per_recipe)
+                self._recipes[key] = entries
+            entries.add(vector, answer, time.time())
+            self._recipes.move_to_end(key)
+            while len(self._recipes) > self.max_recipes:
+                self._recipes.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "recipes": len(self._recipes),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticAnswerCache]:
+    """Return the process-wide semantic cache, or None when SEMANTIC_CACHE=off."""
+    global _cache
+    if SEMANTIC_CACHE == "off":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticAnswerCache()
+    return _cache
@@ -1,28 +1,110 @@
 """
 Tavily API integration for internet search fallback when recipe context is insufficient.
 Set TAVILY_API_KEY in .env for web search.
+Results are cached by normalized query and max_results (TAVILY_CACHE_TTL seconds, at most
+TAVILY_CACHE_SIZE entries), and concurrent identical searches share one outbound call.
 """
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import Any
 
 from dotenv import load_dotenv
 
+from services.clients import get_tavily_client
+
 load_dotenv()
 
+TAVILY_CACHE_TTL = float(os.getenv("TAVILY_CACHE_TTL", 3600))
+TAVILY_CACHE_SIZE = int(os.getenv("TAVILY_CACHE_SIZE", 500))
+
+
+class _SearchCache:
+    """TTL + LRU result cache with single-flight coalescing of in-progress searches."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: OrderedDict[tuple, tuple[float, list]] = OrderedDict()  # key -> (stored at, results)
+        self._inflight: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_search(self, key: tuple, search) -> list[dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return list(future.result())
+
+        results: list[dict[str, Any]] = []
+        try:
+            results = search()
+        finally:
+            with self._lock:
+                # Empty results usually mean an error or missing key; don't pin them in the cache
+                if results:
+                    self._entries[key] = (time.time(), results)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._inflight[key]
+            future.set_result(results)
+        return list(results)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+search_cache = _SearchCache(TAVILY_CACHE_TTL, TAVILY_CACHE_SIZE)
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.lower()).strip()
+
 
 def search_tavily(query: str, max_results: int = 5) -> list[dict[str, Any]]:
     """
-    Search the web using Tavily API.
+    Search the web using Tavily API (cached, see module docstring).
     Returns a list of result dicts with 'title', 'content', and optionally 'url'.
     Returns empty list if TAVILY_API_KEY is missing or on error.
     """
-    api_key = os.getenv("TAVILY_API_KEY")
-    if not api_key:
+    key = (normalize_query(query), max_results)
+    return search_cache.get_or_search(key, lambda: _search_uncached(query, max_results))
+
+
+def _search_uncached(query: str, max_results: int) -> list[dict[str, Any]]:
+    """Call the Tavily API directly."""
+    client = get_tavily_client()
+    if client is None:
         return []
 
     try:
-        from tavily import TavilyClient
-        client = TavilyClient(api_key=api_key)
         response = client.search(query=query, max_results=max_results)
         # Tavily API returns dict with "results" list; each has title, content, url
         if isinstance(response, dict) and "results" in response:
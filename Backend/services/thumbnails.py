@@ -0,0 +1,101 @@
+"""
+Resized / re-encoded recipe image variants ("derivatives") for GET /images/{name}?w=320&format=webp.
+Derivatives are content-addressed: the file name is the SHA-256 of the source image plus the
+variant parameters, so an edited source gets new derivatives and identical sources share one.
+They are generated lazily on first request (or in bulk by scripts/generate_thumbnails.py) and
+written atomically, so concurrent requests never see a partial file.
+
+Requested widths are rounded up to one of IMAGE_WIDTHS, keeping the cache to a few variants
+per image. Cache location: IMAGE_CACHE_DIR (default Backend/images_cache).
+"""
+import os
+import threading
+from typing import Optional
+
+from PIL import Image
+
+from services.http_cache import file_sha256
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(BACKEND_DIR, "images_cache"))
+IMAGE_WIDTHS = sorted(int(w) for w in os.getenv("IMAGE_WIDTHS", "160,320,480,640,960").split(","))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 80))
+# Bump when the resize/encode settings change so old derivatives aren't reused
+PIPELINE_VERSION = 1
+
+FORMATS = {
+    # format -> (file extension, media type)
+    "jpeg": ("jpg", "image/jpeg"),
+    "webp": ("webp", "image/webp"),
+}
+
+_source_widths: dict[tuple, int] = {}
+
+
+def snap_width(width: int) -> int:
+    """Smallest configured width >= width (the largest one if width is bigger than all)."""
+    for allowed in IMAGE_WIDTHS:
+        if allowed >= width:
+            return allowed
+    return IMAGE_WIDTHS[-1]
+
+
+def source_info(path: str) -> tuple[str, int]:
+    """(SHA-256, pixel width) of a source image, memoized by (path, size, mtime) so it's read once."""
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    width = _source_widths.get(memo_key)
+    if width is None:
+        with Image.open(path) as img:
+            width = _source_widths[memo_key] = img.width
+    return file_sha256(path), width
+
+
+def derivative_path(digest: str, width: Optional[int], fmt: str) -> str:
+    ext = FORMATS[fmt][0]
+    name = f"{digest}-w{width or 0}-q{IMAGE_QUALITY}-v{PIPELINE_VERSION}.{ext}"
+    return os.path.join(IMAGE_CACHE_DIR, digest[:2], name)
+
+
+def render_derivative(source: str, dest: str, width: Optional[int], fmt: str) -> None:
+    """Resize (never upscale) and encode source into dest, via a temp file and rename."""
+    with Image.open(source) as img:
+        if width is not None and img.width > width:
+            # draft() lets the JPEG decoder downscale by 1/2, 1/4, 1/8 while decoding
+            img.draft("RGB", (width, img.height * width // img.width))
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if fmt == "webp":
+                img.save(tmp, "WEBP", quality=IMAGE_QUALITY, method=4)
+            else:
+                img.save(tmp, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def get_derivative(source: str, width: Optional[int] = None, fmt: str = "jpeg") -> str:
+    """
+    Path of the requested variant of source, generating it if needed.
+    The original JPEG is returned as is when it is already no wider than asked and no
+    conversion is asked for (images are never upscaled).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    width = snap_width(width) if width is not None else None
+    if width is None and fmt == "jpeg":
+        return source
+    digest, source_width = source_info(source)
+    if width is not None and width >= source_width:
+        if fmt == "jpeg":
+            return source
+        width = None  # same size, only re-encoded
+    dest = derivative_path(digest, width, fmt)
+    if not os.path.isfile(dest):
+        render_derivative(source, dest, width, fmt)
+    return dest
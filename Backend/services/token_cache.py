@@ -0,0 +1,100 @@
+"""
+Cache of Firebase ID token verification results, so an authenticated request doesn't pay the
+Admin SDK check or the identitytoolkit REST round trip every time.
+Entries are keyed by the token's SHA-256 (raw tokens are never stored). Verified tokens live until
+their `exp` claim; rejected tokens are remembered for AUTH_NEGATIVE_CACHE_TTL seconds so a client
+retrying a bad token doesn't hit Google on each attempt.
+
+Configure with AUTH_TOKEN_CACHE_SIZE and AUTH_NEGATIVE_CACHE_TTL (0 disables the negative cache).
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_NEGATIVE_CACHE_TTL = float(os.getenv("AUTH_NEGATIVE_CACHE_TTL", 60))
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """`exp` claim of a JWT, read without checking the signature (only use after verification)."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        return None
+
+
+class VerifiedTokenCache:
+    """LRU of token hash -> verified user or rejection detail, each with its own expiry."""
+
+    def __init__(self, max_entries: int = AUTH_TOKEN_CACHE_SIZE, negative_ttl: float = AUTH_NEGATIVE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        # key -> (expires at, user dict or None, rejection detail or None)
+        self._entries: OrderedDict[str, tuple[float, Optional[dict], Optional[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[tuple[Optional[dict], Optional[str]]]:
+        """(user, None) for a verified token, (None, detail) for a rejected one, None if unknown."""
+        key = token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry[1] is not None:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+            return (dict(entry[1]) if entry[1] is not None else None), entry[2]
+
+    def add(self, token: str, user: dict, expires_at: Optional[float]) -> None:
+        """Remember a verified token until its expiry (not cached if the expiry is unknown)."""
+        if expires_at is None or expires_at <= time.time():
+            return
+        self._put(token_key(token), (expires_at, dict(user), None))
+
+    def reject(self, token: str, detail: str) -> None:
+        """Remember that a token was rejected, for negative_ttl seconds."""
+        if self.negative_ttl > 0:
+            self._put(token_key(token), (time.time() + self.negative_ttl, None, detail))
+
+    def _put(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / total if total else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache()
@@ -2,23 +2,24 @@
 Build an in-memory vector store from recipe content for semantic search.
 Uses LangChain Google Generative AI embeddings and InMemoryVectorStore.
 """
-import os
 from typing import Any
 
 from dotenv import load_dotenv
 
+from services.clients import EMBEDDING_MODEL, get_embeddings
+
 load_dotenv()
 
-# Lazy imports to avoid failing if deps not installed
+
 def _get_embeddings():
-    from langchain_google_genai import GoogleGenerativeAIEmbeddings
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        return None
-    return GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",  # Gemini embedding; use "models/gemini-embedding-001" if needed
-        google_api_key=api_key,
-    )
+    """Shared embeddings client from the client registry (None if GOOGLE_API_KEY is missing)."""
+    return get_embeddings()
+
+
+def is_quota_error(e: Exception) -> bool:
+    """True for rate limit / quota errors from the embedding API (HTTP 429, RESOURCE_EXHAUSTED)."""
+    error_msg = str(e).lower()
+    return "quota" in error_msg or "resource_exhausted" in error_msg or "429" in error_msg
 
 
 def recipe_to_chunks(recipe: dict[str, Any]) -> list[str]:
@@ -38,10 +39,25 @@ def recipe_to_chunks(recipe: dict[str, Any]) -> list[str]:
     return chunks
 
 
+def _load_stored_vectors(recipe: dict[str, Any]):
+    """Return precomputed chunk vectors for the recipe, or None if not indexed or stale."""
+    if recipe.get("id") is None:
+        return None
+    try:
+        from database.pool import pool
+        from services.embedding_index import load_recipe_vectors
+        return load_recipe_vectors(pool.connection(), recipe)
+    except Exception as e:
+        print(f"WARNING: Could not load stored embeddings, embedding recipe on the fly: {e}")
+        return None
+
+
 def build_recipe_vector_store(recipe: dict[str, Any]):
     """
     Build an in-memory vector store from a recipe record.
     Input: recipe dict with title, ingredients/cleaned_ingredients, instructions.
+    Chunk vectors come from the precomputed embedding index when available (built by
+    scripts/populate_db.py --embed), so only the query is embedded at chat time.
     Output: InMemoryVectorStore instance, or None if embeddings unavailable or quota exceeded.
     """
     from langchain_core.vectorstores import InMemoryVectorStore
@@ -51,13 +67,16 @@ def build_recipe_vector_store(recipe: dict[str, Any]):
         return None
 
     chunks = recipe_to_chunks(recipe)
+    stored = _load_stored_vectors(recipe)
+    if stored is not None:
+        from services.embedding_index import PrecomputedEmbeddings
+        embeddings = PrecomputedEmbeddings(dict(zip(chunks, stored)), model=embeddings)
     try:
         vector_store = InMemoryVectorStore.from_texts(chunks, embedding=embeddings)
         return vector_store
     except Exception as e:
         # Handle quota exhaustion or other embedding errors
-        error_msg = str(e).lower()
-        if "quota" in error_msg or "resource_exhausted" in error_msg or "429" in error_msg:
+        if is_quota_error(e):
             print(f"WARNING: Embedding quota exceeded, falling back to non-embedding retrieval: {e}")
         else:
             print(f"WARNING: Error creating vector store, falling back to non-embedding retrieval: {e}")
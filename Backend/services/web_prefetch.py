@@ -0,0 +1,91 @@
+"""
+Speculative Tavily prefetch for chat.
+Questions that usually need the web (substitutions, nutrition, history, storage...) start their
+Tavily search in parallel with the RAG call, so a web fallback doesn't pay the search hop after
+RAG and the sufficiency check. Unneeded prefetches are cancelled if still queued, else discarded.
+
+Enable with TAVILY_SPECULATE=on. Hit/waste counters are exposed through stats().
+"""
+import os
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from services.executor import get_executor
+from services.tavily_search import search_tavily
+
+TAVILY_SPECULATE = os.getenv("TAVILY_SPECULATE", "off")
+
+# Topics a recipe rarely covers
+_WEB_HINTS = re.compile(
+    r"substitut|replace|instead of|swap|alternative|"
+    r"calorie|nutrition|protein|carb|sugar content|fat content|healthy|vitamin|"
+    r"vegan|vegetarian|gluten|dairy[- ]free|keto|allerg|"
+    r"history|origin|invent|traditional|where does|"
+    r"wine|pair|"
+    r"freez|store|storage|shelf life|keep for|leftover|reheat|make ahead",
+    re.IGNORECASE,
+)
+
+
+def predict_needs_web(question: str) -> bool:
+    """Cheap keyword heuristic for questions the recipe text is unlikely to answer."""
+    return bool(_WEB_HINTS.search(question))
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.used = 0       # prefetch consumed by a web fallback
+        self.cancelled = 0  # not needed, cancelled before it ran
+        self.wasted = 0     # not needed, but the search call was already made
+        self.missed = 0     # web fallback needed without a prefetch
+        self._lock = threading.Lock()
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        needed = self.used + self.missed
+        return {
+            "enabled": TAVILY_SPECULATE == "on",
+            "started": self.started,
+            "used": self.used,
+            "cancelled": self.cancelled,
+            "wasted": self.wasted,
+            "missed": self.missed,
+            "hit_rate": self.used / self.started if self.started else 0.0,
+            "coverage": self.used / needed if needed else 0.0,
+        }
+
+
+stats = SpeculationStats()
+
+
+def start_prefetch(question: str, max_results: int = 5) -> Optional[Future]:
+    """Start a Tavily search in the web pool if speculation is on and the question looks web-bound."""
+    if TAVILY_SPECULATE != "on" or not predict_needs_web(question):
+        return None
+    stats.incr("started")
+    return get_executor("web").submit(search_tavily, question, max_results)
+
+
+def web_results(question: str, prefetch: Optional[Future], max_results: int = 5) -> list[dict[str, Any]]:
+    """Web results for a fallback: the prefetched ones if available, otherwise a fresh search."""
+    if prefetch is not None:
+        stats.incr("used")
+        try:
+            return prefetch.result()
+        except Exception:
+            return []
+    stats.incr("missed")
+    return search_tavily(question, max_results=max_results)
+
+
+def discard(prefetch: Optional[Future]) -> None:
+    """Drop a prefetch that turned out not to be needed."""
+    if prefetch is None:
+        return
+    stats.incr("cancelled" if prefetch.cancel() else "wasted")
@@ -0,0 +1,154 @@
+"""Test the parallel embedding builder offline: fake model determinism, rate limiting, 429 backoff, and resume after a crash"""
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import database.connection as connection
+from services.embedding_builder import FAKE_EMBEDDING_MODEL, FakeEmbeddings, TokenBucket, build_index
+from services.embedding_index import unpack_vector
+from services.vector_store import recipe_to_chunks
+
+RECIPES = 300
+BATCH_SIZE = 25
+
+# Scratch database so the test never touches recipes.db
+tmp_dir = tempfile.mkdtemp(prefix="embedding_builder_test_")
+connection.DB_PATH = os.path.join(tmp_dir, "recipes.db")
+connection.init_db()
+conn = connection.get_db_connection()
+conn.executemany(
+    "INSERT INTO recipes (id, title, ingredients, instructions) VALUES (?, ?, ?, ?)",
+    [(i, f"Recipe {i}", f"{i} cups flour, {i % 7} eggs", f"Mix and bake for {i} minutes.") for i in range(1, RECIPES + 1)],
+)
+conn.commit()
+total_chunks = sum(len(recipe_to_chunks(dict(row))) for row in conn.execute("SELECT * FROM recipes"))
+
+
+def recipes():
+    return [dict(row) for row in conn.execute("SELECT * FROM recipes ORDER BY id")]
+
+
+def stored_count() -> int:
+    return conn.execute("SELECT COUNT(*) FROM recipe_embeddings WHERE model = ?", (FAKE_EMBEDDING_MODEL,)).fetchone()[0]
+
+
+def build(embeddings, **kwargs):
+    kwargs.setdefault("rpm", 60000)
+    return build_index(conn, recipes(), embeddings, model=FAKE_EMBEDDING_MODEL, batch_size=BATCH_SIZE, **kwargs)
+
+
+class CrashingEmbeddings(FakeEmbeddings):
+    """Fails for good (not a rate limit) once `crash_after` calls have succeeded."""
+
+    def __init__(self, crash_after: int):
+        super().__init__()
+        self.crash_after = crash_after
+
+    def embed_documents(self, texts):
+        with self._lock:
+            crash = self.calls >= self.crash_after
+        if crash:
+            raise RuntimeError("simulated worker crash")
+        return super().embed_documents(texts)
+
+
+print("=" * 60)
+print("TEST 1: Fake model is deterministic")
+print("=" * 60)
+a, b = FakeEmbeddings(), FakeEmbeddings()
+va = a.embed_documents(["Recipe title: Pancakes", "Ingredients: flour"])
+vb = b.embed_documents(["Recipe title: Pancakes", "Ingredients: flour"])
+print(f"dim: {len(va[0])}, norm: {np.linalg.norm(va[0]):.4f}")
+assert va == vb and va[0] != va[1]
+assert abs(np.linalg.norm(va[0]) - 1) < 1e-5
+assert a.embed_query("Recipe title: Pancakes") == va[0]
+print("[OK]")
+print()
+
+print("=" * 60)
+print(f"TEST 2: Crash mid-build keeps committed batches and the next run resumes ({total_chunks} chunks)")
+print("=" * 60)
+crashing = CrashingEmbeddings(crash_after=5)
+try:
+    build(crashing, workers=4)
+    raise AssertionError("build should have failed")
+except RuntimeError as e:
+    assert "simulated" in str(e)
+saved = stored_count()
+print(f"after crash: {saved} chunks saved")
+assert 0 < saved < total_chunks and saved == crashing.texts_embedded
+
+model = FakeEmbeddings()
+stats = build(model, workers=4)
+print(f"resume: {stats.summary()}")
+assert stats.embedded == total_chunks - saved and model.texts_embedded == total_chunks - saved
+assert stored_count() == total_chunks
+row = conn.execute("SELECT * FROM recipe_embeddings WHERE recipe_id = 7 AND chunk_index = 1").fetchone()
+expected = FakeEmbeddings().embed_documents([recipe_to_chunks(recipes()[6])[1]])[0]
+assert np.allclose(unpack_vector(row["vector"]), expected)
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 3: Up-to-date index makes no calls; a changed recipe re-embeds only its changed chunk")
+print("=" * 60)
+model = FakeEmbeddings()
+stats = build(model)
+assert stats.embedded == 0 and model.calls == 0
+conn.execute("UPDATE recipes SET instructions = 'Bake longer.' WHERE id = 42")
+conn.commit()
+stats = build(model)
+print(stats.summary())
+assert stats.embedded == 1 and model.calls == 1
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 4: 429s are retried with backoff")
+print("=" * 60)
+conn.execute("DELETE FROM recipe_embeddings")
+conn.commit()
+model = FakeEmbeddings(rate_limit_errors=3)
+stats = build(model, workers=4, backoff_base=0.01)
+print(stats.summary())
+assert stats.retries == 3 and stats.embedded == total_chunks and stored_count() == total_chunks
+model = FakeEmbeddings(rate_limit_errors=10)
+conn.execute("DELETE FROM recipe_embeddings")
+conn.commit()
+try:
+    build(model, workers=1, max_retries=2, backoff_base=0.01)
+    raise AssertionError("build should give up after max_retries")
+except RuntimeError as e:
+    assert "429" in str(e)
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 5: Token bucket limits the request rate")
+print("=" * 60)
+now = [0.0]
+bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0], sleep=lambda s: None)
+waits = [bucket.acquire() for _ in range(6)]
+print(f"waits at t=0: {waits}")
+assert waits == [0.0, 0.0, 0.5, 1.0, 1.5, 2.0]
+now[0] = 10.0
+assert bucket.acquire() == 0.0
+bucket.pause(3.0)
+print(f"wait after pause(3): {bucket.acquire()}")
+now[0] = 20.0
+assert bucket.acquire() == 0.0
+
+conn.execute("DELETE FROM recipe_embeddings")
+conn.commit()
+started = time.perf_counter()
+stats = build(FakeEmbeddings(), workers=4, rpm=600)  # 10 requests/s, burst of 4
+elapsed = time.perf_counter() - started
+print(f"{stats.batches} batches at 600 rpm took {elapsed:.2f}s")
+assert elapsed >= (stats.batches - 4) / 10 * 0.9
+print("[OK]")
+
+conn.close()
+shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,85 @@
+"""Hammer one (user, recipe) favorite from many threads and check the single-statement writes stay consistent"""
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import database.connection as connection
+from database import queries
+from database.pool import ConnectionPool
+
+THREADS = 32
+OPS_PER_THREAD = 200
+
+# Scratch database so the test never touches recipes.db
+tmp_dir = tempfile.mkdtemp(prefix="favorites_test_")
+connection.DB_PATH = os.path.join(tmp_dir, "recipes.db")
+connection.init_db()
+db = ConnectionPool(connection.DB_PATH)
+with db.connection() as conn:
+    conn.execute("INSERT INTO recipes (id, title) VALUES (1, 'Banana Bread')")
+
+
+def hammer(op):
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        futures = [pool.submit(lambda: [op() for _ in range(OPS_PER_THREAD)]) for _ in range(THREADS)]
+        return [result for f in futures for result in f.result()]
+
+
+def favorite_rows() -> int:
+    return db.connection().execute(
+        "SELECT COUNT(*) FROM favorites WHERE user_id = 'u1' AND recipe_id = 1"
+    ).fetchone()[0]
+
+
+total = THREADS * OPS_PER_THREAD
+
+print("=" * 60)
+print(f"TEST 1: {total} concurrent PUTs add the favorite exactly once")
+print("=" * 60)
+results = hammer(lambda: queries.add_favorite(db, "u1", 1))
+print(f"changed: {results.count(True)}, no-ops: {results.count(False)}, rows: {favorite_rows()}")
+assert results.count(True) == 1 and results.count(False) == total - 1 and favorite_rows() == 1
+print("[OK]")
+print()
+
+print("=" * 60)
+print(f"TEST 2: {total} concurrent DELETEs remove it exactly once")
+print("=" * 60)
+results = hammer(lambda: queries.remove_favorite(db, "u1", 1))
+print(f"changed: {results.count(True)}, no-ops: {results.count(False)}, rows: {favorite_rows()}")
+assert results.count(True) == 1 and favorite_rows() == 0
+print("[OK]")
+print()
+
+print("=" * 60)
+print(f"TEST 3: {total} interleaved PUTs and DELETEs never error or duplicate")
+print("=" * 60)
+ops = [lambda: queries.add_favorite(db, "u1", 1), lambda: queries.remove_favorite(db, "u1", 1)]
+results = hammer(lambda: random.choice(ops)())
+print(f"operations: {len(results)}, rows: {favorite_rows()}")
+assert len(results) == total and favorite_rows() in (0, 1)
+print("[OK]")
+print()
+
+print("=" * 60)
+print(f"TEST 4: {total} concurrent toggles alternate state without lost updates")
+print("=" * 60)
+queries.remove_favorite(db, "u1", 1)
+results = hammer(lambda: queries.toggle_favorite(db, "u1", 1))
+print(f"now favorited: {results.count(True)}, now unfavorited: {results.count(False)}, rows: {favorite_rows()}")
+# Every toggle sees the previous one's result, so ons and offs pair up and an even count ends unfavorited
+assert results.count(True) == results.count(False) == total // 2 and favorite_rows() == 0
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 5: Unknown recipes are reported, not inserted")
+print("=" * 60)
+assert queries.add_favorite(db, "u1", 999) is None
+assert db.connection().execute("SELECT COUNT(*) FROM favorites WHERE recipe_id = 999").fetchone()[0] == 0
+print("[OK]")
+
+db.close_all()
+shutil.rmtree(tmp_dir, ignore_errors=True)
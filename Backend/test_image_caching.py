@@ -0,0 +1,91 @@
+"""Test HTTP caching of recipe images: ETag, Last-Modified, immutable Cache-Control, 304s and Range requests"""
+import os
+import shutil
+import tempfile
+import time
+from email.utils import formatdate
+
+# Keep generated variants out of Backend/images_cache
+os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="image_cache_test_")
+
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+image_name = sorted(name for name in os.listdir(main.image_index.images_dir) if name.endswith(".jpg"))[0]
+url = f"/images/{image_name}"
+size = os.path.getsize(os.path.join(main.image_index.images_dir, image_name))
+
+
+def check(name: str, condition: bool, detail: str = "") -> None:
+    print(f"{'[OK]' if condition else '[X]'} {name} {detail}")
+    assert condition, name
+
+
+print("=" * 60)
+print("TEST 1: Full response carries caching headers")
+print("=" * 60)
+first = client.get(url)
+etag = first.headers.get("etag")
+check("200 with body", first.status_code == 200 and len(first.content) == size, f"({len(first.content)} bytes)")
+check("strong ETag", bool(etag) and not etag.startswith("W/"), etag)
+check("Last-Modified", "last-modified" in first.headers, first.headers.get("last-modified"))
+check("immutable Cache-Control", "immutable" in first.headers.get("cache-control", "")
+      and "max-age=" in first.headers.get("cache-control", ""), first.headers.get("cache-control"))
+check("Accept-Ranges", first.headers.get("accept-ranges") == "bytes")
+check("ETag is stable", client.get(url).headers.get("etag") == etag)
+print()
+
+print("=" * 60)
+print("TEST 2: If-None-Match revalidation")
+print("=" * 60)
+r = client.get(url, headers={"If-None-Match": etag})
+check("matching ETag -> 304", r.status_code == 304 and r.content == b"")
+check("304 repeats ETag and Cache-Control", r.headers.get("etag") == etag and "immutable" in r.headers.get("cache-control", ""))
+check("weak form matches", client.get(url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304)
+check("list containing ETag", client.get(url, headers={"If-None-Match": f'"other", {etag}'}).status_code == 304)
+check("* matches", client.get(url, headers={"If-None-Match": "*"}).status_code == 304)
+check("stale ETag -> 200", client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200)
+print()
+
+print("=" * 60)
+print("TEST 3: If-Modified-Since revalidation")
+print("=" * 60)
+last_modified = first.headers["last-modified"]
+check("same date -> 304", client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304)
+check("future date -> 304", client.get(url, headers={"If-Modified-Since": formatdate(time.time() + 3600, usegmt=True)}).status_code == 304)
+check("old date -> 200", client.get(url, headers={"If-Modified-Since": formatdate(0, usegmt=True)}).status_code == 200)
+check("garbage date -> 200", client.get(url, headers={"If-Modified-Since": "yesterday"}).status_code == 200)
+r = client.get(url, headers={"If-None-Match": '"stale"', "If-Modified-Since": last_modified})
+check("If-None-Match takes precedence", r.status_code == 200)
+print()
+
+print("=" * 60)
+print("TEST 4: Range requests")
+print("=" * 60)
+r = client.get(url, headers={"Range": "bytes=0-99"})
+check("partial content", r.status_code == 206 and len(r.content) == 100 and r.content == first.content[:100])
+check("Content-Range", r.headers.get("content-range") == f"bytes 0-99/{size}", r.headers.get("content-range"))
+r = client.get(url, headers={"Range": "bytes=-50"})
+check("suffix range", r.status_code == 206 and r.content == first.content[-50:])
+r = client.get(url, headers={"Range": "bytes=0-99", "If-Range": etag})
+check("If-Range with current ETag -> 206", r.status_code == 206)
+r = client.get(url, headers={"Range": "bytes=0-99", "If-Range": '"stale"'})
+check("If-Range with stale ETag -> full 200", r.status_code == 200 and len(r.content) == size)
+r = client.get(url, headers={"Range": f"bytes={size + 10}-"})
+check("unsatisfiable -> 416", r.status_code == 416)
+print()
+
+print("=" * 60)
+print("TEST 5: Resized variants and errors")
+print("=" * 60)
+variant = client.get(url, params={"w": 160, "format": "webp"})
+variant_etag = variant.headers.get("etag")
+check("variant has its own ETag", variant.status_code == 200 and variant_etag and variant_etag != etag, variant_etag)
+r = client.get(url, params={"w": 160, "format": "webp"}, headers={"If-None-Match": variant_etag})
+check("variant revalidates -> 304", r.status_code == 304)
+r = client.get("/images/definitely-not-an-image.jpg")
+check("404 is not cached", r.status_code == 404 and "immutable" not in r.headers.get("cache-control", ""))
+
+shutil.rmtree(os.environ["IMAGE_CACHE_DIR"], ignore_errors=True)
@@ -0,0 +1,205 @@
+"""Test local Firebase ID token verification offline, with a locally generated keypair and certificate"""
+import datetime
+import threading
+import time
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from services.firebase_jwt import FirebaseTokenVerifier, GooglePublicKeys, KeyFetchError, parse_max_age
+
+PROJECT_ID = "test-project"
+
+
+def make_keypair() -> tuple[rsa.RSAPrivateKey, str]:
+    """RSA key and a self-signed PEM certificate, shaped like Google's securetoken certs."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.system.gserviceaccount.com")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return key, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def make_token(key, kid: str, **overrides) -> str:
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "auth_time": now - 10,
+        "sub": "user-123",
+        "iat": now - 10,
+        "exp": now + 3600,
+        "email": "cook@example.com",
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, key, algorithm="RS256", headers={"kid": kid})
+
+
+def expect_invalid(verifier, token, error=jwt.InvalidTokenError) -> None:
+    try:
+        verifier.verify(token)
+    except error:
+        return
+    raise AssertionError("token was accepted")
+
+
+key, cert = make_keypair()
+other_key, other_cert = make_keypair()
+certs = {"kid-1": cert}
+fetch_count = [0]
+
+
+def fake_fetch():
+    fetch_count[0] += 1
+    return dict(certs), 3600
+
+
+keys = GooglePublicKeys(fetch=fake_fetch)
+verifier = FirebaseTokenVerifier(PROJECT_ID, keys)
+
+print("=" * 60)
+print("TEST 1: Valid token verifies, certs fetched once")
+print("=" * 60)
+token = make_token(key, "kid-1")
+for _ in range(3):
+    claims = verifier.verify(token)
+print(f"uid: {claims['uid']}, email: {claims['email']}, cert fetches: {fetch_count[0]}")
+assert claims["uid"] == "user-123" and fetch_count[0] == 1
+start = time.perf_counter()
+for _ in range(200):
+    verifier.verify(token)
+print(f"Average verification: {(time.perf_counter() - start) / 200 * 1e6:.0f} us")
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 2: Bad tokens are rejected")
+print("=" * 60)
+expect_invalid(verifier, make_token(key, "kid-1", exp=int(time.time()) - 3600), jwt.ExpiredSignatureError)
+expect_invalid(verifier, make_token(key, "kid-1", exp=int(time.time()) - 5), jwt.ExpiredSignatureError)  # no leeway on exp
+expect_invalid(verifier, make_token(key, "kid-1", iat=int(time.time()) + 3600))
+verifier.verify(make_token(key, "kid-1", iat=int(time.time()) + 30, auth_time=int(time.time()) + 30))  # clock skew
+expect_invalid(verifier, make_token(key, "kid-1", aud="other-project"))
+expect_invalid(verifier, make_token(key, "kid-1", iss="https://evil.example.com"))
+expect_invalid(verifier, make_token(key, "kid-1", sub=""))
+expect_invalid(verifier, make_token(key, "kid-1", auth_time=int(time.time()) + 3600))
+expect_invalid(verifier, make_token(other_key, "kid-1"))  # wrong signature
+expect_invalid(verifier, jwt.encode({"sub": "x"}, "s" * 32, algorithm="HS256", headers={"kid": "kid-1"}))
+print("[OK] expired (even by seconds), future iat, wrong audience, wrong issuer, empty sub, future auth_time, bad signature, HS256")
+print()
+
+print("=" * 60)
+print("TEST 3: Unknown kid refetches once (key rotation), then is throttled")
+print("=" * 60)
+expect_invalid(verifier, make_token(other_key, "kid-2"))
+assert fetch_count[0] == 1  # fetched less than a minute ago
+keys._last_fetch = 0
+certs["kid-2"] = other_cert
+claims = verifier.verify(make_token(other_key, "kid-2"))
+print(f"cert fetches: {fetch_count[0]}")
+assert claims["uid"] == "user-123" and fetch_count[0] == 2
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 4: Certs close to expiry are refreshed in the background")
+print("=" * 60)
+keys._expires_at = time.time() + 10
+verifier.verify(token)  # served from the current keys
+for _ in range(50):
+    # The fetch is counted before the new keys are stored; wait until the refresh has finished
+    if fetch_count[0] == 3 and not keys._refreshing:
+        break
+    time.sleep(0.02)
+print(f"cert fetches: {fetch_count[0]}")
+assert fetch_count[0] == 3 and keys._expires_at > time.time() + 3000
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 5: Cache-Control max-age and expired certs")
+print("=" * 60)
+assert parse_max_age("public, max-age=19485, must-revalidate, no-transform") == 19485
+assert parse_max_age(None) == 3600
+
+
+def failing_fetch():
+    raise KeyFetchError("offline")
+
+
+keys._fetch = failing_fetch
+keys._expires_at = 0
+verifier.verify(token)  # expired certs are still used when the refresh fails
+try:
+    FirebaseTokenVerifier(PROJECT_ID, GooglePublicKeys(fetch=failing_fetch)).verify(token)
+    raise AssertionError("verified without keys")
+except KeyFetchError:
+    pass
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 6: Cert endpoint outage: no blocking fetches, one attempt per interval")
+print("=" * 60)
+outage_calls = [0]
+
+
+def slow_failing_fetch():
+    outage_calls[0] += 1
+    time.sleep(0.3)
+    raise KeyFetchError("timed out")
+
+
+keys._fetch = slow_failing_fetch
+keys._expires_at = 0
+keys._last_failure = 0
+start = time.perf_counter()
+threads = [threading.Thread(target=verifier.verify, args=(token,)) for _ in range(5)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - start
+print(f"5 concurrent verifies with expired certs: {elapsed * 1000:.0f} ms")
+assert elapsed < 0.25  # served from the expired keys, not waiting for the fetch
+for _ in range(50):
+    if not keys._refreshing:
+        break
+    time.sleep(0.02)
+for _ in range(20):
+    verifier.verify(token)
+print(f"fetch attempts: {outage_calls[0]}")
+assert outage_calls[0] == 1 and not keys._refreshing  # one background attempt, then backing off
+
+cold = GooglePublicKeys(fetch=slow_failing_fetch)
+outage_calls[0] = 0
+errors = []
+
+
+def verify_cold():
+    try:
+        FirebaseTokenVerifier(PROJECT_ID, cold).verify(token)
+    except KeyFetchError as e:
+        errors.append(e)
+
+
+threads = [threading.Thread(target=verify_cold) for _ in range(5)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+start = time.perf_counter()
+verify_cold()
+print(f"no keys yet: {outage_calls[0]} fetch for 6 calls, later call failed in {(time.perf_counter() - start) * 1000:.1f} ms")
+assert outage_calls[0] == 1 and len(errors) == 6 and time.perf_counter() - start < 0.1
+print("[OK]")
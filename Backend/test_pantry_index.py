@@ -0,0 +1,93 @@
+"""Test pantry matching and ranking: descriptor matches, one ingredient per pantry item, and the corpus-dependent "peanut butter" rule"""
+import os
+import shutil
+import tempfile
+
+import database.connection as connection
+from services.ingredient_index import PantryIndex, rebuild_ingredient_index
+
+# Scratch database so the test never touches recipes.db
+tmp_dir = tempfile.mkdtemp(prefix="pantry_index_test_")
+connection.DB_PATH = os.path.join(tmp_dir, "recipes.db")
+connection.init_db()
+conn = connection.get_db_connection()
+
+
+def load(recipes):
+    """Replace the recipes with {id: [ingredient lines]} and return a fresh pantry index."""
+    conn.execute("DELETE FROM recipes")
+    conn.executemany(
+        "INSERT INTO recipes (id, title, cleaned_ingredients) VALUES (?, ?, ?)",
+        [(recipe_id, f"Recipe {recipe_id}", repr(lines)) for recipe_id, lines in recipes.items()],
+    )
+    rebuild_ingredient_index(conn)
+    return PantryIndex.from_db(conn)
+
+
+def ranked(index, pantry, **kwargs):
+    return {r["id"]: (r["matched"], r["total"]) for r in index.rank(pantry, **kwargs)}
+
+
+print("=" * 60)
+print("TEST 1: Descriptors match, and each item covers one ingredient")
+print("=" * 60)
+index = load({
+    1: ["2 chicken thighs", "1 chicken breast", "1 onion, diced", "3 cloves garlic"],
+    2: ["1 cup chicken broth", "1 tsp kosher salt"],
+    3: ["1 lb chicken thighs", "1 red onion"],
+})
+results = ranked(index, ["chicken", "onion"])
+print(results)
+# 'chicken' covers one of the two chicken cuts in recipe 1; 'chicken broth' is a different food
+assert results[1] == (2, 4)
+assert results[3] == (2, 2)  # 'red' is only a descriptor here, so 'onion' covers 'red onion'
+assert 2 not in results
+assert [r["id"] for r in index.rank(["chicken", "onion"])] == [3, 1]
+assert ranked(index, ["salt"]) == {2: (1, 2)}
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 2: Matching is one-to-one, not bounded by min(items, ingredients)")
+print("=" * 60)
+# Three items hit recipe 1 and three of its ingredients are hit, but both salt items can only
+# cover 'kosher salt' and 'chicken' covers one cut: at most 2 of 4 ingredients are covered
+index = load({
+    1: ["1 tsp kosher salt", "2 chicken thighs", "1 chicken breast", "1 onion"],
+    2: ["1 tsp kosher salt", "1 lb chicken thighs", "1 onion"],
+})
+results = ranked(index, ["Kosher salt", "kosher salt", "chicken"])
+print(results)
+assert results == {1: (2, 4), 2: (2, 3)}
+order = [r["id"] for r in index.rank(["Kosher salt", "kosher salt", "chicken"])]
+assert order == [2, 1]
+assert ranked(index, ["Kosher salt", "kosher salt", "chicken"], max_missing=1) == {2: (2, 3)}
+assert ranked(index, ["Kosher salt", "kosher salt", "chicken"], limit=1) == {2: (2, 3)}
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 3: 'butter' vs 'peanut butter' depends on 'peanut' being an ingredient in the corpus")
+print("=" * 60)
+with_peanuts = load({
+    1: ["1/2 cup peanut butter", "1 cup sugar"],
+    2: ["4 tbsp butter", "1 cup flour"],
+    3: ["1 cup peanuts", "1 tsp salt"],
+})
+results = ranked(with_peanuts, ["butter"])
+print(f"with 'peanut' in the corpus: {results}")
+assert results == {2: (1, 2)}
+
+without_peanuts = load({
+    1: ["1/2 cup peanut butter", "1 cup sugar"],
+    2: ["4 tbsp butter", "1 cup flour"],
+})
+results = ranked(without_peanuts, ["butter"])
+print(f"without it: {results}")
+# 'peanut' is then just a descriptor, like 'kosher' in 'kosher salt'
+assert results == {1: (1, 2), 2: (1, 2)}
+assert ranked(without_peanuts, ["peanut butter"]) == {1: (1, 2)}
+print("[OK]")
+
+conn.close()
+shutil.rmtree(tmp_dir, ignore_errors=True)
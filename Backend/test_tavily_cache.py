@@ -0,0 +1,60 @@
+"""Test the Tavily result cache against the local fake Tavily server (no network or API quota)"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from fake_tavily_server import FakeTavilyServer
+
+server = FakeTavilyServer(delay=0.3).start()
+os.environ["TAVILY_API_KEY"] = "fake"
+os.environ["TAVILY_API_BASE_URL"] = server.url
+
+from services.clients import reset_clients
+from services.tavily_search import search_cache, search_tavily
+
+reset_clients("tavily")
+search_cache.clear()
+
+print("=" * 60)
+print("TEST 1: Concurrent identical searches share one upstream call")
+print("=" * 60)
+queries = ["Can I freeze banana bread?", "can i freeze  banana bread?"] * 4
+with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+    results = list(pool.map(search_tavily, queries))
+print(f"Upstream requests: {server.requests}, stats: {search_cache.stats()}")
+assert server.requests == 1, server.requests
+assert all(r == results[0] and len(r) == 5 for r in results)
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 2: Repeat search is served from the cache")
+print("=" * 60)
+results = search_tavily("CAN I FREEZE BANANA BREAD?")
+print(f"Upstream requests: {server.requests}, stats: {search_cache.stats()}")
+assert server.requests == 1 and len(results) == 5
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 3: Different max_results or query misses")
+print("=" * 60)
+assert len(search_tavily("Can I freeze banana bread?", max_results=3)) == 3
+search_tavily("Is banana bread healthy?")
+print(f"Upstream requests: {server.requests}, stats: {search_cache.stats()}")
+assert server.requests == 3
+print("[OK]")
+print()
+
+print("=" * 60)
+print("TEST 4: Expired entries are fetched again")
+print("=" * 60)
+search_cache.ttl = 0
+search_tavily("Is banana bread healthy?")
+print(f"Upstream requests: {server.requests}")
+assert server.requests == 4
+print("[OK]")
+
+server.shutdown()
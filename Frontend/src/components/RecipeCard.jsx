@@ -11,7 +11,7 @@ const RecipeCard = ({ recipe, isFavorite, onToggleFavorite }) => {
     const navigate = useNavigate();
     const imageName = recipe?.image_name?.trim?.() || recipe?.imageName?.trim?.();
     const imageUrl = imageName
-        ? `${API_BASE_URL}/images/${imageName}${imageName.toLowerCase().endsWith(".jpg") ? "" : ".jpg"}`
+        ? `${API_BASE_URL}/images/${imageName}${imageName.toLowerCase().endsWith(".jpg") ? "" : ".jpg"}?w=320&format=webp`
         : PLACEHOLDER_IMAGE;
 
     const handleViewRecipe = () => {
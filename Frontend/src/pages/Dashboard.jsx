@@ -39,8 +39,8 @@ const Dashboard = () => {
                 const token = await currentUser.getIdToken();
                 const headers = { 'Authorization': `Bearer ${token}` };
 
-                // Fetch recipes
-                const recipesRes = await fetch(`${API_BASE_URL}/api/recipes`, { headers });
+                // Fetch recipes (only the columns the cards and the search filter use)
+                const recipesRes = await fetch(`${API_BASE_URL}/api/recipes?fields=id,title,image_name,cleaned_ingredients`, { headers });
                 if (!recipesRes.ok) throw new Error('Failed to fetch recipes');
                 const recipesData = await recipesRes.json();
                 setRecipes(recipesData);
@@ -73,8 +73,9 @@ const Dashboard = () => {
             setFavorites(newFavorites);
 
             const token = await currentUser.getIdToken();
+            // PUT/DELETE are idempotent, so repeated clicks can't flip the state back
             const response = await fetch(`${API_BASE_URL}/api/favorites/${recipeId}`, {
-                method: 'POST',
+                method: isFav ? 'DELETE' : 'PUT',
                 headers: {
                     'Authorization': `Bearer ${token}`
                 }